@@ -0,0 +1,158 @@
+"""
+Image preprocessing before upload to the vision model.
+
+Phone photos are often several megapixels and several megabytes, while the
+model sees far fewer pixels. Uploads are therefore decoded once, downscaled so
+the longest edge is at most ``LEAF_IMAGE_MAX_EDGE`` pixels, and re-encoded as
+quality-tuned JPEG or WebP before base64 encoding, with the MIME type that
+matches the bytes actually sent.
+
+Usage:
+    >>> image = load_image(image_bytes)
+    >>> prepared = prepare_image(image_bytes, image)
+    >>> data_url = to_data_url(prepared.data, prepared.mime)
+"""
+
+import os
+import io
+import base64
+import logging
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+try:
+    from PIL import Image, ImageOps
+    PIL_AVAILABLE = True
+except ImportError:  # uploads are then sent unchanged
+    Image = ImageOps = None
+    PIL_AVAILABLE = False
+
+
+logger = logging.getLogger(__name__)
+
+MAX_EDGE = int(os.getenv("LEAF_IMAGE_MAX_EDGE", 1024))
+FORMAT = os.getenv("LEAF_IMAGE_FORMAT", "JPEG").upper()  # JPEG or WEBP
+QUALITY = int(os.getenv("LEAF_IMAGE_QUALITY", 85))
+
+MIME_TYPES = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp", "GIF": "image/gif"}
+
+
+@dataclass
+class PreparedImage:
+    """
+    Bytes ready for upload plus what was done to them.
+
+    Attributes:
+        data (bytes): Encoded image to send
+        mime (str): MIME type of ``data``
+        size (Optional[Tuple[int, int]]): Pixel size sent, None if not decoded
+        original_bytes (int): Size of the upload as received
+        reencoded (bool): False when the original bytes are sent unchanged
+    """
+    data: bytes
+    mime: str
+    size: Optional[Tuple[int, int]]
+    original_bytes: int
+    reencoded: bool
+
+
+def sniff_mime(data: bytes) -> Optional[str]:
+    """Return the MIME type from the file signature, or None if unknown."""
+    if data[:2] == b"BM":
+        return "image/bmp"
+    if data[:4] in (b"II*\x00", b"MM\x00*"):
+        return "image/tiff"
+    if data[:3] == b"\xff\xd8\xff":
+        return "image/jpeg"
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        return "image/png"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    return None
+
+
+def load_image(data: bytes, max_edge: int = MAX_EDGE):
+    """
+    Decode an upload once, upright and no larger than ``max_edge``.
+
+    JPEGs are decoded directly at a reduced DCT scale when that still covers
+    ``max_edge``, which avoids materializing the full-resolution photo.
+
+    Returns:
+        Optional[PIL.Image.Image]: The image, or None if Pillow is missing or
+                                   the bytes cannot be decoded.
+    """
+    if not PIL_AVAILABLE:
+        return None
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.draft("RGB", (max_edge, max_edge))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_edge, max_edge), Image.LANCZOS)
+        return image
+    except Exception as e:
+        logger.warning(f"Could not decode image, sending it unchanged: {e}")
+        return None
+
+
+def encode_image(image, fmt: str = FORMAT, quality: int = QUALITY) -> Tuple[bytes, str]:
+    """Encode a decoded image as JPEG or WebP; returns ``(bytes, mime)``."""
+    fmt = fmt.upper()
+    if image.mode in ("RGBA", "LA", "P"):
+        # Flatten transparency onto white; black would read as dark leaf tissue
+        rgba = image.convert("RGBA")
+        image = Image.new("RGB", rgba.size, (255, 255, 255))
+        image.paste(rgba, mask=rgba.getchannel("A"))
+    elif image.mode != "RGB":
+        image = image.convert("RGB")
+    buf = io.BytesIO()
+    if fmt == "WEBP":
+        image.save(buf, format="WEBP", quality=quality, method=4)
+    else:
+        fmt = "JPEG"
+        image.save(buf, format="JPEG", quality=quality, optimize=True, progressive=True)
+    return buf.getvalue(), MIME_TYPES[fmt]
+
+
+def prepare_image(data: bytes, image=None, max_edge: int = MAX_EDGE,
+                  fmt: str = FORMAT, quality: int = QUALITY, mime: Optional[str] = None) -> PreparedImage:
+    """
+    Downscale and re-encode an upload for the vision model.
+
+    The original bytes are kept when the image could not be decoded, or when
+    it already fits ``max_edge`` and re-encoding would not make it smaller.
+    Bytes sent unchanged keep the type sniffed from their signature, else the
+    ``mime`` the client declared, else ``application/octet-stream``; they are
+    never labelled as a format they were not encoded in.
+
+    Args:
+        data (bytes): Upload as received
+        image: Result of ``load_image(data)`` if already decoded
+        mime (Optional[str]): Content type the client sent with the upload
+
+    Returns:
+        PreparedImage: Bytes to send with their MIME type
+    """
+    image = image if image is not None else load_image(data, max_edge)
+    original_mime = sniff_mime(data)
+    if image is None:
+        prepared = PreparedImage(data, original_mime or mime or "application/octet-stream", None, len(data), False)
+    else:
+        encoded, mime = encode_image(image, fmt, quality)
+        resized = max(Image.open(io.BytesIO(data)).size) > max(image.size)
+        if not resized and original_mime in MIME_TYPES.values() and len(encoded) >= len(data):
+            prepared = PreparedImage(data, original_mime, image.size, len(data), False)
+        else:
+            prepared = PreparedImage(encoded, mime, image.size, len(data), True)
+
+    size = f"{prepared.size[0]}x{prepared.size[1]}" if prepared.size else "not decoded"
+    logger.info(f"Image payload: {prepared.original_bytes} -> {len(prepared.data)} bytes "
+                f"({prepared.mime}, {size}, {'re-encoded' if prepared.reencoded else 'unchanged'})")
+    return prepared
+
+
+def to_data_url(data: bytes, mime: str) -> str:
+    """Base64 data URL for the chat API's ``image_url`` field, built in one pass."""
+    return f"data:{mime};base64,{base64.b64encode(data).decode('ascii')}"
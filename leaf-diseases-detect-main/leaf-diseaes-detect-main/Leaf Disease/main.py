@@ -2,10 +2,12 @@ import os
 import json
 import logging
 import sys
+import threading
 from typing import Dict, Optional, List
 from dataclasses import dataclass
 from datetime import datetime
 
+import httpx
 from groq import Groq
 from dotenv import load_dotenv
 
@@ -16,6 +18,105 @@ logging.basicConfig(level=logging.INFO,
 logger = logging.getLogger(__name__)
 
 
+# Shared HTTP connection pool for every Groq call in the process
+GROQ_MAX_CONNECTIONS = int(os.getenv("GROQ_MAX_CONNECTIONS", 10))
+GROQ_KEEPALIVE_EXPIRY = float(os.getenv("GROQ_KEEPALIVE_EXPIRY", 60))
+GROQ_TIMEOUT = float(os.getenv("GROQ_TIMEOUT", 60))
+
+
+class ConnectionMetrics:
+    """
+    Thread-safe counters showing how often Groq requests reuse a pooled connection.
+
+    Fed by httpx's ``trace`` request extension: every request sends its
+    headers once, but only requests that had to open a socket emit a
+    TCP connect (and TLS handshake) event. The difference is the number of
+    requests served on a kept-alive connection.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+        self.tls_handshakes = 0
+
+    def trace(self, event_name: str, info: Dict) -> None:
+        with self._lock:
+            if event_name == "connection.connect_tcp.complete":
+                self.new_connections += 1
+            elif event_name == "connection.start_tls.complete":
+                self.tls_handshakes += 1
+            elif event_name.endswith(".send_request_headers.started"):
+                self.requests += 1
+
+    def attach(self, request: httpx.Request) -> None:
+        """httpx request event hook: asks the transport to report connection events."""
+        request.extensions["trace"] = self.trace
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            reused = max(0, self.requests - self.new_connections)
+            return {
+                "requests": self.requests,
+                "new_connections": self.new_connections,
+                "tls_handshakes": self.tls_handshakes,
+                "reused_connections": reused,
+                "reuse_ratio": round(reused / self.requests, 3) if self.requests else None,
+            }
+
+
+connection_metrics = ConnectionMetrics()
+_http_client: Optional[httpx.Client] = None
+_detector: Optional["LeafDiseaseDetector"] = None
+_detector_lock = threading.Lock()
+
+
+def shared_http_client() -> httpx.Client:
+    """
+    Process-wide keep-alive pool used by the Groq client.
+
+    ``httpx.Client`` is thread-safe, so concurrent requests share its
+    connections instead of each opening (and TLS-negotiating) a new one.
+    """
+    global _http_client
+    with _detector_lock:
+        if _http_client is None:
+            _http_client = httpx.Client(
+                limits=httpx.Limits(max_connections=GROQ_MAX_CONNECTIONS,
+                                    max_keepalive_connections=GROQ_MAX_CONNECTIONS,
+                                    keepalive_expiry=GROQ_KEEPALIVE_EXPIRY),
+                timeout=GROQ_TIMEOUT,
+                event_hooks={"request": [connection_metrics.attach]},
+            )
+        return _http_client
+
+
+def get_detector() -> "LeafDiseaseDetector":
+    """
+    Return the process-wide LeafDiseaseDetector, creating it on first use.
+
+    The instance (and its Groq client) lives for the whole process, so
+    ``load_dotenv()`` and client construction run once rather than per image.
+    If construction fails (e.g. no API key yet) the next call tries again.
+
+    Raises:
+        ValueError: If no GROQ_API_KEY is configured.
+    """
+    global _detector
+    if _detector is None:
+        http_client = shared_http_client()
+        with _detector_lock:
+            if _detector is None:
+                _detector = LeafDiseaseDetector(http_client=http_client)
+    return _detector
+
+
+def connection_stats() -> Dict:
+    """Connection reuse counters of the shared Groq pool (JSON serializable)."""
+    return {**connection_metrics.snapshot(), "max_connections": GROQ_MAX_CONNECTIONS,
+            "detector_initialized": _detector is not None}
+
+
 @dataclass
 class DiseaseAnalysisResult:
     """
@@ -73,7 +174,7 @@ class LeafDiseaseDetector:
         client (Groq): Groq API client instance
 
     Example:
-        >>> detector = LeafDiseaseDetector()
+        >>> detector = get_detector()
         >>> result = detector.analyze_leaf_image_base64(base64_image_data)
         >>> if result['disease_type'] == 'invalid_image':
         ...     print("Please upload a plant leaf image")
@@ -87,7 +188,8 @@ class LeafDiseaseDetector:
     DEFAULT_TEMPERATURE = 0.3
     DEFAULT_MAX_TOKENS = 1024
 
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None,
+                 http_client: Optional[httpx.Client] = None):
         """
         Initialize the Leaf Disease Detector with API credentials.
 
@@ -98,18 +200,24 @@ class LeafDiseaseDetector:
         Args:
             api_key (Optional[str]): Groq API key. If None, will attempt to
                                    load from GROQ_API_KEY environment variable.
+            http_client (Optional[httpx.Client]): Connection pool for the Groq
+                                   client. Defaults to the shared, metered pool
+                                   (see ``shared_http_client``).
 
         Raises:
             ValueError: If no valid API key is found in parameters or environment.
 
         Note:
             Ensure your .env file contains GROQ_API_KEY or pass it directly.
+            Servers should use ``get_detector()`` instead of constructing one
+            per request.
         """
         load_dotenv()
         self.api_key = api_key or os.environ.get("GROQ_API_KEY")
         if not self.api_key:
             raise ValueError("GROQ_API_KEY not found in environment variables")
-        self.client = Groq(api_key=self.api_key)
+        self.client = Groq(api_key=self.api_key,
+                           http_client=http_client or shared_http_client())
         logger.info("Leaf Disease Detector initialized")
 
     def create_analysis_prompt(self) -> str:
@@ -168,7 +276,8 @@ class LeafDiseaseDetector:
 
     def analyze_leaf_image_base64(self, base64_image: str,
                                   temperature: float = None,
-                                  max_tokens: int = None) -> Dict:
+                                  max_tokens: int = None,
+                                  mime_type: str = "image/jpeg") -> Dict:
         """
         Analyze base64 encoded image data for leaf diseases and return JSON result.
 
@@ -177,9 +286,11 @@ class LeafDiseaseDetector:
         'invalid_image' response. For valid leaf images, performs disease analysis.
 
         Args:
-            base64_image (str): Base64 encoded image data (without data:image prefix)
+            base64_image (str): Base64 encoded image data, or a complete
+                                ``data:<mime>;base64,...`` URL (sent as is)
             temperature (float, optional): Model temperature for response generation
             max_tokens (int, optional): Maximum tokens for response
+            mime_type (str, optional): MIME type of bare base64 data
 
         Returns:
             Dict: Analysis results as dictionary (JSON serializable)
@@ -199,9 +310,11 @@ class LeafDiseaseDetector:
             if not base64_image:
                 raise ValueError("base64_image cannot be empty")
 
-            # Clean base64 string (remove data URL prefix if present)
+            # A data URL already names its MIME type; bare base64 gets mime_type
             if base64_image.startswith('data:'):
-                base64_image = base64_image.split(',', 1)[1]
+                image_url = base64_image
+            else:
+                image_url = f"data:{mime_type};base64,{base64_image}"
 
             # Prepare request parameters
             temperature = temperature or self.DEFAULT_TEMPERATURE
@@ -221,7 +334,7 @@ class LeafDiseaseDetector:
                             {
                                 "type": "image_url",
                                 "image_url": {
-                                    "url": f"data:image/jpeg;base64,{base64_image}"
+                                    "url": image_url
                                 }
                             }
                         ]
@@ -0,0 +1,292 @@
+"""
+Result cache for leaf disease analyses.
+
+Field staff often upload the same leaf photo, or a recompressed or resized
+copy of it, several times. Each upload would cost a full vision-model call.
+This module keys analysis results by:
+
+    - an exact content hash (SHA-256 of the uploaded bytes),
+    - a 64-bit difference hash (dHash) of the picture, which changes by only
+      a few bits under recompression, resizing or small brightness changes, and
+    - an 8x8 RGB colour thumbnail. dHash is grayscale and structural, so a
+      leaf with the same outline but chlorotic or rusty patches can match it;
+      colour is the diagnostic signal and must agree as well.
+
+A lookup first tries the exact hash, then the closest entry whose dHash is
+within ``max_distance`` bits (Hamming distance) and whose thumbnail differs by
+at most ``max_color_diff`` levels in every cell and channel. Entries live in
+an in-memory LRU tier and a persistent SQLite tier, each with its own TTL.
+
+Usage:
+    >>> cache = get_result_cache()
+    >>> key = cache.key(image_bytes)
+    >>> result = cache.get(key)
+    >>> if result is None:
+    ...     result = detector.analyze_leaf_image_base64(b64)
+    ...     cache.put(key, result)
+"""
+
+import os
+import io
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+try:
+    from PIL import Image, ImageOps
+    PIL_AVAILABLE = True
+except ImportError:  # exact-hash matching still works without Pillow
+    Image = ImageOps = None
+    PIL_AVAILABLE = False
+
+
+logger = logging.getLogger(__name__)
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.getenv("LEAF_CACHE_DIR", os.path.join(PROJECT_DIR, "result_cache"))
+MEMORY_ENTRIES = int(os.getenv("LEAF_CACHE_MEMORY_ENTRIES", 512))
+MEMORY_TTL = float(os.getenv("LEAF_CACHE_MEMORY_TTL", 3600))
+DISK_ENTRIES = int(os.getenv("LEAF_CACHE_DISK_ENTRIES", 20000))
+DISK_TTL = float(os.getenv("LEAF_CACHE_DISK_TTL", 7 * 24 * 3600))
+# Bits (of 64) two dHashes may differ by and still count as the same photo
+MAX_DISTANCE = int(os.getenv("LEAF_CACHE_MAX_DISTANCE", 2))
+# Largest per-cell, per-channel difference (0-255) of the 8x8 colour thumbnails
+MAX_COLOR_DIFF = int(os.getenv("LEAF_CACHE_MAX_COLOR_DIFF", 12))
+SCHEMA_VERSION = 2
+
+
+@dataclass(frozen=True)
+class ImageKey:
+    """Cache key of one upload: content hash, dHash and colour thumbnail (both None if undecodable)."""
+    sha256: str
+    dhash: Optional[int]
+    color: Optional[bytes] = None
+
+
+def fingerprint(image, hash_size: int = 8) -> Tuple[Optional[int], Optional[bytes]]:
+    """
+    Compute the 64-bit difference hash and the colour thumbnail of an image.
+
+    For the dHash the picture is reduced to a (hash_size + 1) x hash_size
+    grayscale thumbnail and each bit records whether a pixel is brighter than
+    its right-hand neighbour, so the hash follows the picture's structure
+    rather than its exact bytes. The colour thumbnail is the hash_size x
+    hash_size box-averaged RGB picture (3 * hash_size**2 bytes).
+
+    Args:
+        image: ``PIL.Image`` or raw encoded image bytes
+
+    Returns:
+        Tuple[Optional[int], Optional[bytes]]: ``(dhash, color)``, or
+            ``(None, None)`` if Pillow is missing or the bytes are not a
+            decodable image.
+    """
+    if not PIL_AVAILABLE:
+        return None, None
+    try:
+        if isinstance(image, (bytes, bytearray, memoryview)):
+            image = Image.open(io.BytesIO(image))
+            # JPEG can decode straight to a small scale; the thumbnails only need 9x8 pixels
+            image.draft("RGB", (hash_size * 8, hash_size * 8))
+        image = ImageOps.exif_transpose(image).convert("RGB")
+        gray = image.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS)
+        color = image.resize((hash_size, hash_size), Image.BOX).tobytes()
+    except Exception as e:
+        logger.warning(f"Could not compute perceptual hash: {e}")
+        return None, None
+    pixels = gray.tobytes()
+    bits = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return bits, color
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def color_diff(a: Optional[bytes], b: Optional[bytes]) -> int:
+    """Largest per-cell, per-channel difference of two colour thumbnails (255 if either is missing)."""
+    if a is None or b is None or len(a) != len(b):
+        return 255
+    return max(abs(x - y) for x, y in zip(a, b))
+
+
+class ResultCache:
+    """
+    Two-tier (memory LRU + SQLite) cache of analysis results keyed by ImageKey.
+
+    Thread-safe: one lock guards both tiers. Only successful analyses should
+    be stored; ``put`` serializes the result as JSON.
+
+    Attributes:
+        stats (Dict[str, int]): Hit/miss counters (``memory_hits``,
+            ``disk_hits``, ``similar_hits``, ``misses``, ``stores``,
+            ``expired``)
+    """
+
+    def __init__(self, path: Optional[str] = None, memory_entries: int = MEMORY_ENTRIES,
+                 memory_ttl: float = MEMORY_TTL, disk_entries: int = DISK_ENTRIES,
+                 disk_ttl: float = DISK_TTL, max_distance: int = MAX_DISTANCE,
+                 max_color_diff: int = MAX_COLOR_DIFF):
+        self.memory_entries = int(memory_entries)
+        self.memory_ttl = float(memory_ttl)
+        self.disk_entries = int(disk_entries)
+        self.disk_ttl = float(disk_ttl)
+        self.max_distance = int(max_distance)
+        self.max_color_diff = int(max_color_diff)
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()  # sha256 -> (stored_at, dhash, color, result)
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "similar_hits": 0, "misses": 0, "stores": 0, "expired": 0}
+
+        self._db = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            if self._db.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                self._db.execute("DROP TABLE IF EXISTS results")  # entries from an older layout lack colour
+                self._db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            self._db.execute("CREATE TABLE IF NOT EXISTS results (sha256 TEXT PRIMARY KEY, dhash INTEGER, "
+                             "color BLOB, stored_at REAL NOT NULL, result TEXT NOT NULL)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS results_stored_at ON results (stored_at)")
+            self._db.commit()
+
+    def key(self, data: bytes, image=None) -> ImageKey:
+        """Build the cache key of an upload (pass an already decoded ``image`` to avoid decoding twice)."""
+        return ImageKey(hashlib.sha256(data).hexdigest(), *fingerprint(image if image is not None else data))
+
+    def get(self, key: ImageKey) -> Optional[Dict]:
+        """Return the cached result for this photo or a near-identical one, or None."""
+        now = time.time()
+        with self._lock:
+            self._expire_memory(now)
+            hit = self._memory.get(key.sha256)
+            if hit is not None:
+                self._memory.move_to_end(key.sha256)
+                self.stats["memory_hits"] += 1
+                return json.loads(hit[3])
+
+            row = self._db_exact(key.sha256, now)
+            if row is not None:
+                self.stats["disk_hits"] += 1
+                self._remember(key.sha256, row[0], row[1], row[2], now)
+                return json.loads(row[2])
+
+            if key.dhash is not None:
+                result = self._similar(key, now)
+                if result is not None:
+                    self.stats["similar_hits"] += 1
+                    return json.loads(result)
+
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, key: ImageKey, result: Dict) -> None:
+        now = time.time()
+        payload = json.dumps(result)
+        with self._lock:
+            self.stats["stores"] += 1
+            self._remember(key.sha256, key.dhash, key.color, payload, now)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+                                 (key.sha256, _to_signed(key.dhash), key.color, now, payload))
+                self._db.execute("DELETE FROM results WHERE stored_at < ?", (now - self.disk_ttl,))
+                self._db.execute("DELETE FROM results WHERE sha256 NOT IN "
+                                 "(SELECT sha256 FROM results ORDER BY stored_at DESC LIMIT ?)", (self.disk_entries,))
+                self._db.commit()
+
+    def snapshot(self) -> Dict:
+        """Counters plus tier sizes (JSON serializable)."""
+        with self._lock:
+            lookups = sum(self.stats[k] for k in ("memory_hits", "disk_hits", "similar_hits", "misses"))
+            hits = lookups - self.stats["misses"]
+            disk = self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0] if self._db is not None else 0
+            return {**self.stats, "hit_ratio": round(hits / lookups, 3) if lookups else None,
+                    "memory_entries": len(self._memory), "disk_entries": disk,
+                    "max_distance": self.max_distance, "max_color_diff": self.max_color_diff,
+                    "perceptual_hash": PIL_AVAILABLE}
+
+    # --- internals (lock held) ---
+
+    def _remember(self, sha256, dhash_value, color, payload, stored_at):
+        self._memory[sha256] = (stored_at, dhash_value, color, payload)
+        self._memory.move_to_end(sha256)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _expire_memory(self, now):
+        stale = [k for k, (stored_at, *_) in self._memory.items() if now - stored_at > self.memory_ttl]
+        for k in stale:
+            del self._memory[k]
+        self.stats["expired"] += len(stale)
+
+    def _db_exact(self, sha256, now):
+        if self._db is None:
+            return None
+        row = self._db.execute("SELECT dhash, color, result FROM results WHERE sha256 = ? AND stored_at >= ?",
+                               (sha256, now - self.disk_ttl)).fetchone()
+        return None if row is None else (_to_unsigned(row[0]), row[1], row[2])
+
+    def _matches(self, key, h, color):
+        """dHash distance if ``(h, color)`` counts as the same photo as ``key``, else None."""
+        if h is None:
+            return None
+        distance = hamming(h, key.dhash)
+        if distance > self.max_distance or color_diff(color, key.color) > self.max_color_diff:
+            return None
+        return distance
+
+    def _similar(self, key, now):
+        best = None  # (distance, payload)
+        for _, h, color, payload in self._memory.values():
+            d = self._matches(key, h, color)
+            if d is not None and (best is None or d < best[0]):
+                best = (d, payload)
+        if best is None and self._db is not None:
+            # Scan fingerprints only; the payload is read for the winning row alone
+            rows = self._db.execute("SELECT sha256, dhash, color FROM results WHERE dhash IS NOT NULL "
+                                    "AND stored_at >= ?", (now - self.disk_ttl,))
+            nearest = None
+            for sha256, h, color in rows:
+                d = self._matches(key, _to_unsigned(h), color)
+                if d is not None and (nearest is None or d < nearest[0]):
+                    nearest = (d, sha256)
+            if nearest is not None:
+                row = self._db.execute("SELECT result FROM results WHERE sha256 = ?", (nearest[1],)).fetchone()
+                best = (nearest[0], row[0])
+        if best is None:
+            return None
+        logger.info(f"Result cache: near-duplicate image (dHash distance {best[0]})")
+        # Remember this copy's exact hash too, so its next upload is an exact hit
+        self._remember(key.sha256, key.dhash, key.color, best[1], now)
+        return best[1]
+
+
+def _to_signed(value: Optional[int]) -> Optional[int]:
+    # SQLite integers are signed 64-bit
+    return None if value is None else (value - (1 << 64) if value >= 1 << 63 else value)
+
+
+def _to_unsigned(value: Optional[int]) -> Optional[int]:
+    return None if value is None else value & ((1 << 64) - 1)
+
+
+_cache: Optional[ResultCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache:
+    """Return the process-wide result cache (SQLite file under ``LEAF_CACHE_DIR``)."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResultCache(os.path.join(CACHE_DIR, "results.sqlite3"))
+        return _cache
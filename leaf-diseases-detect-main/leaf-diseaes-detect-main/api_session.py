@@ -0,0 +1,19 @@
+"""
+Shared HTTP session for calls from the Flask frontends to the detection API.
+
+Both frontends import ``session`` from here, so their remote fallback reuses
+one keep-alive connection pool (with retries on 502/503/504) instead of
+opening a new connection per upload.
+"""
+
+import os
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+API_URL = os.environ.get("DETECT_API_URL", "http://localhost:8000")
+
+session = requests.Session()
+_adapter = HTTPAdapter(max_retries=Retry(total=2, backoff_factor=0.5, status_forcelist=(502, 503, 504)))
+session.mount("http://", _adapter)
+session.mount("https://", _adapter)
@@ -2,7 +2,7 @@ from fastapi import FastAPI, Request, HTTPException, UploadFile, File
 from fastapi.responses import JSONResponse
 import logging
 import os
-from utils import convert_image_to_base64_and_test, test_with_base64_data
+from utils import convert_image_to_base64_and_test, test_with_base64_data, connection_stats, get_result_cache
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -23,7 +23,7 @@ async def disease_detection_file(file: UploadFile = File(...)):
         contents = await file.read()
         
     # Process file directly from memory
-        result = convert_image_to_base64_and_test(contents)
+        result = convert_image_to_base64_and_test(contents, file.content_type)
         
     # No cleanup needed since file is not saved locally
         
@@ -38,6 +38,18 @@ async def disease_detection_file(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
+@app.get("/metrics/connections")
+async def connection_metrics():
+    """Groq connection pool reuse: requests sent vs. new TCP/TLS connections opened"""
+    return connection_stats()
+
+
+@app.get("/metrics/cache")
+async def cache_metrics():
+    """Result cache hit/miss counters (exact, near-duplicate and on-disk hits)"""
+    return get_result_cache().snapshot()
+
+
 @app.get("/")
 async def root():
     """Root endpoint providing API information"""
@@ -45,6 +57,8 @@ async def root():
         "message": "Leaf Disease Detection API",
         "version": "1.0.0",
         "endpoints": {
-            "disease_detection_file": "/disease-detection-file (POST, file upload)"
+            "disease_detection_file": "/disease-detection-file (POST, file upload)",
+            "connection_metrics": "/metrics/connections (GET)",
+            "cache_metrics": "/metrics/cache (GET)"
         }
     }
@@ -1,13 +1,11 @@
 from flask import Flask, render_template, request, redirect, url_for, flash
 import requests
 import os
+from api_session import API_URL, session
 
 app = Flask(__name__)
 app.secret_key = os.environ.get("FLASK_SECRET", "dev_secret")
 
-# Backend API URL - default to localhost where FastAPI might run
-API_URL = os.environ.get("DETECT_API_URL", "http://localhost:8000")
-
 # Try to import local detection helper. If unavailable, we'll fallback to proxying to the API.
 try:
     from utils import convert_image_to_base64_and_test
@@ -49,7 +47,7 @@ def detect():
     # Fallback: forward the uploaded file to the existing API endpoint
     try:
         files = {"file": (file.filename, file_bytes, file.content_type)}
-        resp = requests.post(f"{API_URL}/disease-detection-file", files=files, timeout=30)
+        resp = session.post(f"{API_URL}/disease-detection-file", files=files, timeout=30)
         if resp.status_code == 200:
             result = resp.json()
             return render_template("leaf_index.html", result=result)
@@ -1,8 +1,6 @@
-import os
 from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
 import requests
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+from api_session import API_URL, session
 
 leaf_bp = Blueprint(
     "leaf",
@@ -12,8 +10,6 @@ leaf_bp = Blueprint(
     static_url_path="/leaf-static"
 )
 
-API_URL = os.environ.get("DETECT_API_URL", "http://localhost:8000")
-
 try:
     from utils import convert_image_to_base64_and_test
     LOCAL_DETECT_AVAILABLE = True
@@ -51,12 +47,6 @@ def detect():
 
     # 2) Try remote detection API with retries and sensible timeouts
     try:
-        session = requests.Session()
-        retries = Retry(total=2, backoff_factor=0.5, status_forcelist=(502, 503, 504))
-        adapter = HTTPAdapter(max_retries=retries)
-        session.mount("http://", adapter)
-        session.mount("https://", adapter)
-
         files = {"file": (file.filename, file_bytes, file.content_type)}
         resp = session.post(f"{API_URL}/disease-detection-file", files=files, timeout=10)
         resp.raise_for_status()
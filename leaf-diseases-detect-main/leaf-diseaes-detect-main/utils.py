@@ -7,14 +7,15 @@ This script demonstrates how to send base64 image data directly to the detector.
 
 import json
 import sys,os
-import base64
 from pathlib import Path
 
 # Add the Leaf Disease directory to Python path
 sys.path.insert(0, str(Path(__file__).parent / "Leaf Disease"))
 
 try:
-    from main import LeafDiseaseDetector
+    from main import get_detector, connection_stats
+    from result_cache import get_result_cache
+    from image_prep import load_image, prepare_image, to_data_url
 except ImportError as e:
     print(f'{{"error": "Could not import LeafDiseaseDetector: {str(e)}"}}')
     sys.exit(1)
@@ -24,11 +25,14 @@ def test_with_base64_data(base64_image_string: str):
     """
     Test disease detection with base64 image data
 
+    Uses the process-wide detector, so every caller shares one Groq client
+    and its connection pool.
+
     Args:
-        base64_image_string (str): Base64 encoded image data
+        base64_image_string (str): Base64 encoded image data or data URL
     """
     try:
-        detector = LeafDiseaseDetector()
+        detector = get_detector()
         result = detector.analyze_leaf_image_base64(base64_image_string)
         print(json.dumps(result, indent=2))
         return result
@@ -37,21 +41,44 @@ def test_with_base64_data(base64_image_string: str):
         return None
 
 
-def convert_image_to_base64_and_test(image_bytes: bytes):
+def convert_image_to_base64_and_test(image_bytes: bytes, mime_type: str = None):
     """
     Convert image bytes to base64 and test it
 
+    Results are cached by exact content hash and perceptual hash, so repeated
+    uploads of the same leaf photo skip the vision model call.
+
+    The image is decoded once, downscaled to ``LEAF_IMAGE_MAX_EDGE`` and
+    re-encoded (see ``image_prep``) before it is sent as a data URL.
+
     Args:
         image_bytes (bytes): Image data in bytes
+        mime_type (str, optional): Content type declared by the client, used
+            when the bytes are sent unchanged and their format is not recognised
     """
     try:
         if not image_bytes:
             print('{"error": "No image bytes provided"}')
             return None
 
-        base64_string = base64.b64encode(image_bytes).decode('utf-8')
-        print(f"Converted image to base64 ({len(base64_string)} characters)")
-        return test_with_base64_data(base64_string)
+        # Decoded once: the perceptual hash and the re-encoded upload share it
+        image = load_image(image_bytes)
+
+        # Same photo (or a recompressed copy) analysed before: skip the model call
+        cache = get_result_cache()
+        key = cache.key(image_bytes, image=image)
+        cached = cache.get(key)
+        if cached is not None:
+            print("Returning cached analysis for a previously seen image")
+            return cached
+
+        prepared = prepare_image(image_bytes, image, mime=mime_type)
+        data_url = to_data_url(prepared.data, prepared.mime)
+        print(f"Converted image to base64 ({len(data_url)} characters, {prepared.mime})")
+        result = test_with_base64_data(data_url)
+        if result is not None:
+            cache.put(key, result)
+        return result
     except Exception as e:
         print(f'{{"error": "{str(e)}"}}')
         return None
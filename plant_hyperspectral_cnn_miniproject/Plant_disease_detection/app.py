@@ -1,7 +1,11 @@
 import os
-from flask import Blueprint, render_template, request, redirect, url_for
-from werkzeug.utils import secure_filename
+from flask import Blueprint, render_template, request, redirect, url_for, jsonify, abort, send_from_directory
 from .model_hyperspectral import run_hyperspectral_analysis
+from .model_cache import ModelCache
+from .jobs import JobManager, JobQueueFull
+from .artifacts import ArtifactStore, NAME_RE
+from .tiles import TileCache, load_spec
+from .spectral_indices import parse_wavelengths
 
 plant_bp = Blueprint(
     "plant", __name__,
@@ -10,35 +14,221 @@ plant_bp = Blueprint(
 )
 
 BASE = os.path.dirname(os.path.abspath(__file__))
-UPLOAD_DIR = os.path.join(BASE, "static", "uploads")
 OUT_DIR = os.path.join(BASE, "static", "analysis")
-os.makedirs(UPLOAD_DIR, exist_ok=True)
+MODEL_DIR = os.getenv("PLANT_MODEL_CACHE_DIR", os.path.join(BASE, "model_cache"))
+ARTIFACT_DIR = os.getenv("PLANT_ARTIFACT_DIR", os.path.join(BASE, "artifacts"))
+ARTIFACT_MAX_AGE = 365 * 24 * 3600
+TILE_DIR = os.getenv("PLANT_TILE_DIR", os.path.join(BASE, "tile_cache"))
 os.makedirs(OUT_DIR, exist_ok=True)
+model_cache = ModelCache(MODEL_DIR)
+artifacts = ArtifactStore(ARTIFACT_DIR)
+tiles = TileCache(TILE_DIR)
+jobs = JobManager()
 
-ALLOWED = {"npy"}
-def allowed(fn): return "." in fn and fn.rsplit(".", 1)[1].lower() in ALLOWED
+ALLOWED = {"npy", "raw", "img", "hdr"}
+ENVI_DATA = {"raw", "img"}
+WAVELENGTH_TABLES = {"txt", "csv"}
+def extension(fn): return fn.rsplit(".", 1)[1].lower() if "." in fn else ""
+def allowed(fn, exts=ALLOWED): return extension(fn) in exts
+
+# Per-request training knobs accepted as form fields: name -> (type, minimum); bool fields are checkboxes.
+TRAIN_FIELDS = {"epochs": (int, 1), "time_budget": (float, 0.1), "patience": (int, 1), "sample_budget": (int, 10),
+                "pca_components": (int, 1), "compare_full_band": (bool, None)}
+
+def training_overrides(form):
+    """Training parameters the client set on the upload form; raises ValueError on bad values."""
+    params = {}
+    for name, (cast, minimum) in TRAIN_FIELDS.items():
+        raw = (form.get(name) or "").strip()
+        if not raw:
+            continue
+        if cast is bool:
+            params[name] = raw.lower() in ("1", "true", "on", "yes")
+            continue
+        try:
+            value = cast(raw)
+        except ValueError:
+            raise ValueError(f"{name} must be a number, got {raw!r}") from None
+        if value < minimum:
+            raise ValueError(f"{name} must be at least {minimum}")
+        params[name] = value
+    if params.get("compare_full_band") and not params.get("pca_components"):
+        raise ValueError("compare_full_band needs pca_components")
+    return params
 
 @plant_bp.route("/")
 def index():
     return render_template("plant_index.html")
 
-@plant_bp.route("/analyze", methods=["POST"])
-def analyze():
+def analyze_artifacts(data_name, label_name, zone_name=None, header_name=None, train_params=None,
+                      wavelengths=None, progress=None):
+    """Runs the analysis on stored uploads, keeping them pinned until it finishes."""
+    try:
+        label_path = artifacts.path(label_name) if label_name else None
+        zone_path = artifacts.path(zone_name) if zone_name else None
+        header_path = artifacts.path(header_name) if header_name else None
+        result = run_hyperspectral_analysis(artifacts.path(data_name), label_path, OUT_DIR,
+                                            model_cache=model_cache, progress=progress, artifacts=artifacts,
+                                            zones=zone_path, header_path=header_path, train_params=train_params,
+                                            wavelengths=wavelengths,
+                                            digests=artifacts.digests(data_name, label_name, header_name))
+        result["artifacts"].update(cube=data_name, labels=label_name, zones=zone_name, header=header_name)
+        return result
+    finally:
+        artifacts.unpin(data_name, label_name, zone_name, header_name)
+
+def submit_upload():
+    """Stores the uploaded cube (and optional labels / zone mask) and queues the analysis; returns the job or None.
+
+    The cube is either a ``.npy`` or an ENVI ``.raw``/``.img`` uploaded with its ``.hdr``
+    in the ``header`` field; ENVI data is analyzed in place, without conversion.
+    A ``.txt``/``.csv`` band table in the ``wavelengths`` field (nm, one value per
+    band) places the spectral indices on cubes whose own header has none.
+    Raises ValueError for invalid training fields (see ``TRAIN_FIELDS``) or wavelength tables.
+    """
+    train_params = training_overrides(request.form)
+    wavelength_file = request.files.get("wavelengths")
+    wavelengths = None
+    if wavelength_file and wavelength_file.filename:
+        if not allowed(wavelength_file.filename, WAVELENGTH_TABLES):
+            raise ValueError("the wavelength table must be a .txt or .csv file")
+        wavelengths = parse_wavelengths(wavelength_file.read().decode("utf-8", errors="replace"))
     data_file = request.files.get("cube")
+    header_file = request.files.get("header")
     label_file = request.files.get("labels")
+    zone_file = request.files.get("zones")
+
+    if not data_file or not allowed(data_file.filename, ALLOWED - {"hdr"}):
+        return None
+    data_ext = extension(data_file.filename)
+    if data_ext in ENVI_DATA and not (header_file and allowed(header_file.filename, {"hdr"})):
+        return None
+
+    # Pinned as they are committed, so a concurrent eviction cannot remove them first.
+    data_name = artifacts.put_stream(data_file.stream, data_ext, pin=True)
+
+    header_name = None
+    if data_ext in ENVI_DATA:
+        header_name = artifacts.put_stream(header_file.stream, "hdr", pin=True)
+
+    label_name = None
+    if label_file and allowed(label_file.filename, {"npy"}):
+        label_name = artifacts.put_stream(label_file.stream, "npy", pin=True)
+
+    zone_name = None
+    if zone_file and allowed(zone_file.filename, {"npy"}):
+        zone_name = artifacts.put_stream(zone_file.stream, "npy", pin=True)
 
-    if not data_file or not allowed(data_file.filename):
+    try:
+        return jobs.submit(analyze_artifacts, data_name, label_name, zone_name, header_name, train_params,
+                           wavelengths)
+    except JobQueueFull:
+        artifacts.unpin(data_name, label_name, zone_name, header_name)
+        raise
+
+@plant_bp.route("/artifacts/<name>")
+def artifact(name):
+    if not NAME_RE.match(name) or not artifacts.exists(name):
+        abort(404)
+    # Names are content hashes, so the bytes behind a URL never change.
+    resp = send_from_directory(artifacts.root, name, max_age=ARTIFACT_MAX_AGE, etag=name.split(".", 1)[0])
+    resp.cache_control.immutable = True
+    resp.cache_control.public = True
+    return resp
+
+@plant_bp.route("/tiles/<tileset>/<layer>/<int:z>/<int:x>/<int:y>.png")
+def tile(tileset, layer, z, x, y):
+    """One 256 x 256 XYZ tile of a result layer, cut and cached on first request."""
+    if not NAME_RE.match(tileset) or not artifacts.exists(tileset):
+        abort(404)
+    spec = load_spec(artifacts.path(tileset))
+    source = spec["layers"].get(layer, {}).get("source")
+    if source is None or not artifacts.exists(source):
+        abort(404)
+    path = tiles.tile(tileset, layer, spec, artifacts.path(source), z, x, y)
+    if path is None:
+        abort(404)
+    # The tileset name is a content hash, so a tile URL always shows the same pixels.
+    resp = send_from_directory(os.path.dirname(path), os.path.basename(path), max_age=ARTIFACT_MAX_AGE)
+    resp.cache_control.immutable = True
+    resp.cache_control.public = True
+    return resp
+
+@plant_bp.route("/analyze", methods=["POST"])
+def analyze():
+    if request.accept_mimetypes.best == "application/json":
+        return submit_job()
+    try:
+        job = submit_upload()
+    except JobQueueFull as e:
+        return render_template("plant_job.html", job=None, error=str(e)), 503
+    except ValueError as e:
+        return render_template("plant_job.html", job=None, error=str(e)), 400
+    if job is None:
         return redirect(url_for("plant.index"))
+    return redirect(url_for("plant.job_page", job_id=job.id))
 
-    data_path = os.path.join(UPLOAD_DIR, secure_filename(data_file.filename))
-    data_file.save(data_path)
+@plant_bp.route("/jobs", methods=["POST"])
+def submit_job():
+    try:
+        job = submit_upload()
+    except JobQueueFull as e:
+        return jsonify({"error": str(e)}), 503
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if job is None:
+        return jsonify({"error": "a .npy cube, or an ENVI .raw/.img cube with its .hdr header, is required"}), 400
+    return jsonify({
+        "job_id": job.id,
+        "status_url": url_for("plant.job_status", job_id=job.id),
+        "result_url": url_for("plant.job_result", job_id=job.id),
+        "result_json_url": url_for("plant.job_result_json", job_id=job.id),
+    }), 202
+
+@plant_bp.route("/jobs/<job_id>")
+def job_status(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "unknown job"}), 404
+    return jsonify(job.to_dict())
+
+@plant_bp.route("/jobs/<job_id>/view")
+def job_page(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return redirect(url_for("plant.index"))
+    return render_template("plant_job.html", job=job.to_dict(), error=None)
+
+@plant_bp.route("/jobs/<job_id>/result")
+def job_result(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return redirect(url_for("plant.index"))
+    if job.status != "done":
+        return redirect(url_for("plant.job_page", job_id=job_id))
+    result = job.result
+    plot_url = url_for("plant.artifact", name=result["plot_file"])
+    tileset = (result.get("artifacts") or {}).get("tileset")
+    viewer = None
+    if tileset and artifacts.exists(tileset):
+        url = url_for("plant.tile", tileset=tileset, layer="LAYER", z=0, x=0, y=0)
+        viewer = {**load_spec(artifacts.path(tileset)), "url": url.replace("LAYER/0/0/0.png", "{layer}/{z}/{x}/{y}.png")}
+    return render_template("plant_result.html", result=result, plot_url=plot_url, downloads=download_urls(result),
+                           viewer=viewer)
 
-    label_path = None
-    if label_file and allowed(label_file.filename):
-        label_path = os.path.join(UPLOAD_DIR, secure_filename(label_file.filename))
-        label_file.save(label_path)
+def download_urls(result, external=False):
+    """Artifact URLs of a finished analysis (plot, prediction map .npz / RLE .json, index rasters .npz)."""
+    return {kind: url_for("plant.artifact", name=name, _external=external)
+            for kind, name in (result.get("artifacts") or {}).items() if name}
 
-    result = run_hyperspectral_analysis(data_path, label_path, OUT_DIR)
-    # blueprint-aware static URL:
-    plot_url = url_for("plant.static", filename=f"analysis/{result['plot_file']}")
-    return render_template("plant_result.html", result=result, plot_url=plot_url)
+@plant_bp.route("/jobs/<job_id>/result.json")
+def job_result_json(job_id):
+    """The analysis dict plus download links; 202 with the job status while it is still running."""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "unknown job"}), 404
+    if job.status == "error":
+        return jsonify(job.to_dict()), 500
+    if job.status != "done":
+        return jsonify(job.to_dict()), 202
+    return jsonify({**job.result, "downloads": download_urls(job.result, external=True)})
@@ -0,0 +1,113 @@
+# artifacts.py
+import os
+import re
+import uuid
+import hashlib
+import threading
+from collections import Counter
+
+
+DEFAULT_MAX_BYTES = int(os.getenv("PLANT_ARTIFACT_MB", 2048)) * 1024 * 1024
+NAME_RE = re.compile(r"^[0-9a-f]{64}\.[a-z0-9]+$")
+
+
+# ======================
+# Content-addressed store
+# ======================
+class ArtifactStore:
+    """Uploads, plots and prediction maps stored as ``<sha256>.<ext>`` in one directory.
+
+    Identical content always maps to the same name, so repeated uploads are
+    stored once and URLs can be cached forever. Entries are evicted least
+    recently used (by mtime) once the directory exceeds ``max_bytes``; names
+    pinned by a running analysis are never evicted.
+    """
+
+    def __init__(self, root, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+        self._pins = Counter()
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, name):
+        if not NAME_RE.match(name):
+            raise ValueError(f"Not an artifact name: {name!r}")
+        return os.path.join(self.root, name)
+
+    def digests(self, *names):
+        """``{path: sha256}`` for stored artifacts; the name already is the content hash."""
+        return {self.path(n): n.split(".", 1)[0] for n in names if n}
+
+    def exists(self, name):
+        return os.path.exists(self.path(name))
+
+    def temp_path(self, ext):
+        return os.path.join(self.root, f".tmp-{uuid.uuid4().hex}.{ext}")
+
+    def _commit(self, tmp, digest, ext, pin=False):
+        name = f"{digest}.{ext.lower()}"
+        dest = self.path(name)
+        with self._lock:
+            if os.path.exists(dest):
+                os.remove(tmp)
+                os.utime(dest)
+            else:
+                os.replace(tmp, dest)
+            if pin:
+                self._pins[name] += 1
+            self._evict(keep=name)
+        return name
+
+    def put_stream(self, stream, ext, chunk_size=1024 * 1024, pin=False):
+        """Copies a file-like object into the store while hashing it; returns the artifact name.
+
+        With ``pin`` the artifact is pinned in the same locked step that commits it,
+        so no concurrent eviction can remove it before the caller uses it (``unpin`` when done).
+        """
+        h = hashlib.sha256()
+        tmp = self.temp_path(ext)
+        with open(tmp, "wb") as f:
+            for chunk in iter(lambda: stream.read(chunk_size), b""):
+                h.update(chunk)
+                f.write(chunk)
+        return self._commit(tmp, h.hexdigest(), ext, pin=pin)
+
+    def put_bytes(self, data, ext):
+        tmp = self.temp_path(ext)
+        with open(tmp, "wb") as f:
+            f.write(data)
+        return self._commit(tmp, hashlib.sha256(data).hexdigest(), ext)
+
+    def put_file(self, src, ext):
+        """Moves ``src`` (e.g. a file written to ``temp_path``) into the store."""
+        with open(src, "rb") as f:
+            h = hashlib.sha256()
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(chunk)
+        return self._commit(src, h.hexdigest(), ext)
+
+    def pin(self, *names):
+        with self._lock:
+            self._pins.update(n for n in names if n)
+
+    def unpin(self, *names):
+        with self._lock:
+            self._pins.subtract(n for n in names if n)
+            self._pins += Counter()  # drop zero counts
+
+    def _evict(self, keep=None):
+        entries = []
+        for name in os.listdir(self.root):
+            if not NAME_RE.match(name):
+                continue
+            st = os.stat(os.path.join(self.root, name))
+            entries.append((st.st_mtime, st.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if name == keep or self._pins[name] > 0:
+                continue
+            os.remove(os.path.join(self.root, name))
+            total -= size
@@ -0,0 +1,76 @@
+# band_reduction.py
+import numpy as np
+import torch
+
+
+# ======================
+# Streaming PCA
+# ======================
+class StreamingPCA:
+    """PCA over pixel spectra fitted from running sums, one chunk at a time.
+
+    ``partial_fit`` only accumulates the per-band sum and the C x C scatter
+    matrix (float64), so fitting touches each block once and needs no more
+    memory than one chunk plus C^2 floats.
+    """
+
+    def __init__(self, n_components):
+        self.n_components = int(n_components)
+        self.mean = None
+        self.components = None
+        self.explained_variance_ratio = None
+        self._n = 0
+        self._sum = None
+        self._scatter = None
+
+    def partial_fit(self, X):
+        X = np.asarray(X, dtype=np.float64).reshape(-1, X.shape[-1])
+        if self._sum is None:
+            C = X.shape[1]
+            self._sum = np.zeros(C)
+            self._scatter = np.zeros((C, C))
+        self._n += len(X)
+        self._sum += X.sum(axis=0)
+        self._scatter += X.T @ X
+        return self
+
+    def finalize(self):
+        mean = self._sum / self._n
+        cov = self._scatter / self._n - np.outer(mean, mean)
+        eigval, eigvec = np.linalg.eigh(cov)
+        order = np.argsort(eigval)[::-1][:self.n_components]
+        self.mean = mean.astype(np.float32)
+        self.components = eigvec[:, order].T.astype(np.float32)
+        total = float(np.clip(eigval, 0, None).sum())
+        self.explained_variance_ratio = float(np.clip(eigval[order], 0, None).sum() / total) if total > 0 else 1.0
+        return self
+
+    def fit_source(self, source):
+        """Fits over a ``HyperspectralCube`` (streamed) or an in-memory H x W x C array."""
+        if hasattr(source, "iter_blocks"):
+            for _, _, block in source.iter_blocks():
+                self.partial_fit(block)
+        else:
+            self.partial_fit(source)
+        return self.finalize()
+
+    def transform(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        return (X - self.mean) @ self.components.T
+
+    __call__ = transform
+
+    def state(self):
+        return {
+            "mean": torch.from_numpy(self.mean),
+            "components": torch.from_numpy(self.components),
+            "explained_variance_ratio": self.explained_variance_ratio,
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        pca = cls(state["components"].shape[0])
+        pca.mean = state["mean"].numpy()
+        pca.components = state["components"].numpy()
+        pca.explained_variance_ratio = state["explained_variance_ratio"]
+        return pca
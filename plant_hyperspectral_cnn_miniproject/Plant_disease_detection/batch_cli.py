@@ -0,0 +1,192 @@
+# batch_cli.py
+"""Analyze a directory (or manifest) of hyperspectral cubes in parallel.
+
+    python -m plant_hyperspectral_cnn_miniproject.Plant_disease_detection.batch_cli \
+        survey_2024/ --out results/ --workers 4
+
+A directory is scanned for ``*.npy`` cubes and ENVI ``*.hdr`` headers;
+``<name>_labels.npy`` or ``<name>_gt.npy`` next to a cube is used as its label
+map. A manifest is a CSV
+(``cube,labels`` columns) or a JSON list of ``{"cube": ..., "labels": ...}``;
+an optional ``wavelengths`` column names a band table (nm per band, see
+``spectral_indices.parse_wavelengths``) for cubes without one, overriding
+``--wavelengths``.
+Finished scenes are journaled to ``<out>/results.jsonl`` as they complete, so
+re-running the same command after a crash only processes what is left.
+"""
+import os
+import sys
+import csv
+import json
+import time
+import hashlib
+import argparse
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+
+CUBE_EXTENSIONS = (".npy", ".hdr")  # ENVI images are picked up through their header
+LABEL_SUFFIXES = ("_labels.npy", "_gt.npy")
+SUMMARY_FIELDS = ("id", "cube", "labels", "status", "ndvi_mean", "lci_mean", "accuracy", "seconds", "error")
+
+
+# ======================
+# Inputs
+# ======================
+def discover(path):
+    """List of ``{"cube", "labels"}`` pairs from a directory or manifest file."""
+    if os.path.isdir(path):
+        names = sorted(os.listdir(path))
+        pairs = []
+        for name in names:
+            if not name.endswith(CUBE_EXTENSIONS) or name.endswith(LABEL_SUFFIXES):
+                continue
+            stem = os.path.splitext(name)[0]
+            labels = next((os.path.join(path, stem + s) for s in LABEL_SUFFIXES if stem + s in names), None)
+            pairs.append({"cube": os.path.join(path, name), "labels": labels})
+        return pairs
+
+    base = os.path.dirname(os.path.abspath(path))
+    if path.endswith(".json"):
+        with open(path) as f:
+            rows = json.load(f)
+    else:
+        with open(path, newline="") as f:
+            rows = list(csv.DictReader(f))
+    resolve = lambda p: os.path.join(base, p) if p and not os.path.isabs(p) else (p or None)
+    return [{"cube": resolve(r["cube"]), "labels": resolve(r.get("labels")), "wavelengths": resolve(r.get("wavelengths"))}
+            for r in rows]
+
+
+def scene_id(pair):
+    cube = os.path.abspath(pair["cube"])
+    digest = hashlib.sha1(f"{cube}|{pair['labels'] or ''}".encode()).hexdigest()[:10]
+    return f"{os.path.splitext(os.path.basename(cube))[0]}-{digest}"
+
+
+def load_journal(path):
+    done = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    rec = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn last line from a crash
+                if rec.get("status") == "done":
+                    done[rec["id"]] = rec
+    return done
+
+
+# ======================
+# Workers
+# ======================
+def init_worker(torch_threads):
+    # Cap intra-op threads so N workers do not each spin up one thread per core.
+    os.environ["OMP_NUM_THREADS"] = str(torch_threads)
+    os.environ["MKL_NUM_THREADS"] = str(torch_threads)
+    import torch
+    torch.set_num_threads(torch_threads)
+
+
+def analyze_one(pair, out_dir, options):
+    from .model_hyperspectral import run_hyperspectral_analysis
+    from .model_cache import ModelCache
+    from .spectral_indices import parse_wavelengths
+
+    sid = scene_id(pair)
+    start = time.perf_counter()
+    rec = {"id": sid, "cube": pair["cube"], "labels": pair["labels"]}
+    try:
+        cache = ModelCache(options["model_cache"]) if options.get("model_cache") else None
+        table = pair.get("wavelengths") or options.get("wavelengths")
+        wavelengths = None
+        if table:
+            with open(table) as f:
+                wavelengths = parse_wavelengths(f.read())
+        result = run_hyperspectral_analysis(pair["cube"], pair["labels"], os.path.join(out_dir, sid),
+                                            model_cache=cache, summarize=options["summarize"], wavelengths=wavelengths,
+                                            train_params=options.get("train_params"), predict_workers=1)
+        rec.update(status="done", ndvi_mean=result["ndvi_mean"], lci_mean=result["lci_mean"],
+                   accuracy=result["accuracy"], result=result)
+    except Exception as e:
+        rec.update(status="error", error=f"{e}", traceback=traceback.format_exc())
+    rec["seconds"] = time.perf_counter() - start
+    return rec
+
+
+# ======================
+# Driver
+# ======================
+def write_summary(out_dir, records):
+    rows = [{k: r.get(k) for k in SUMMARY_FIELDS} for r in records]
+    with open(os.path.join(out_dir, "summary.csv"), "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+    with open(os.path.join(out_dir, "summary.json"), "w") as f:
+        json.dump(rows, f, indent=2)
+
+
+def run_batch(source, out_dir, workers=2, torch_threads=None, summarize=False, model_cache=None, train_params=None,
+              wavelengths=None):
+    os.makedirs(out_dir, exist_ok=True)
+    pairs = discover(source)
+    journal_path = os.path.join(out_dir, "results.jsonl")
+    done = load_journal(journal_path)
+    todo = [p for p in pairs if scene_id(p) not in done]
+    print(f"{len(pairs)} scenes, {len(done)} already done, {len(todo)} to run on {workers} workers")
+
+    torch_threads = torch_threads or max(1, (os.cpu_count() or 1) // workers)
+    options = {"summarize": summarize, "model_cache": model_cache, "train_params": train_params,
+               "wavelengths": wavelengths}
+    records = dict(done)
+    with open(journal_path, "a") as journal, \
+            ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(torch_threads,)) as pool:
+        futures = [pool.submit(analyze_one, p, out_dir, options) for p in todo]
+        for fut in as_completed(futures):
+            rec = fut.result()
+            journal.write(json.dumps(rec, default=str) + "\n")
+            journal.flush()
+            os.fsync(journal.fileno())
+            records[rec["id"]] = rec
+            print(f"[{rec['status']}] {rec['id']} ({rec['seconds']:.1f}s)")
+
+    ordered = [records[scene_id(p)] for p in pairs if scene_id(p) in records]
+    write_summary(out_dir, ordered)
+    return ordered
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("source", help="directory of .npy cubes, or a .csv/.json manifest")
+    ap.add_argument("--out", default="batch_results")
+    ap.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    ap.add_argument("--torch-threads", type=int, help="intra-op threads per worker (default: cores / workers)")
+    ap.add_argument("--model-cache", help="shared model cache directory")
+    ap.add_argument("--summarize", action="store_true", help="also request the TinyLlama summary per scene")
+    ap.add_argument("--sample-budget", type=int, help="train on a stratified sample of about this many labeled pixels")
+    ap.add_argument("--wavelengths", help="band table (.txt/.csv, nm per band) for .npy cubes without one")
+    ap.add_argument("--pca-components", type=int, help="project spectra onto this many principal components")
+    ap.add_argument("--compare-full-band", action="store_true",
+                    help="with --pca-components, also train on all bands and report both in band_reduction")
+    args = ap.parse_args(argv)
+    if args.compare_full_band and not args.pca_components:
+        ap.error("--compare-full-band needs --pca-components")
+
+    train_params = {name: value for name, value in (("sample_budget", args.sample_budget),
+                                                     ("pca_components", args.pca_components),
+                                                     ("compare_full_band", args.compare_full_band)) if value}
+    records = run_batch(args.source, args.out, workers=args.workers, torch_threads=args.torch_threads,
+                        summarize=args.summarize, model_cache=args.model_cache, train_params=train_params or None,
+                        wavelengths=args.wavelengths)
+    failed = [r for r in records if r["status"] != "done"]
+    print(f"Wrote {os.path.join(args.out, 'summary.csv')} ({len(records) - len(failed)} ok, {len(failed)} failed)")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
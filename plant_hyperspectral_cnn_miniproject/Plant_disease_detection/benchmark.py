@@ -0,0 +1,306 @@
+# benchmark.py
+"""Stage-by-stage benchmark of the hyperspectral pipeline on synthetic scenes.
+
+Run from the project root:
+
+    python -m plant_hyperspectral_cnn_miniproject.Plant_disease_detection.benchmark \
+        --sizes 64x64x32,256x256x100 --out bench.json --compare previous_bench.json
+
+Every scene size runs in a fresh process so its peak RSS is not inflated by
+earlier runs; the Ollama summary is replaced by a canned response.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+# Every stage a scene may report, in report order ("export" is skipped with --export-mode none).
+STAGES = ("load_normalize", "split", "train", "train_dataloader", "evaluate", "export", "predict", "indices",
+          "render", "end_to_end")
+
+
+def peak_rss_mb():
+    """Process-wide peak RSS since start (or since the last ``reset_peak_rss``) in MiB."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def reset_peak_rss():
+    """Resets the kernel's RSS high-water mark (Linux only); returns whether it worked."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+# ======================
+# Synthetic scenes
+# ======================
+def synthetic_wavelengths(C):
+    """Band centres (nm) of the synthetic scenes: an evenly spaced 400-1000 nm (VNIR) sensor.
+
+    All built-in indices lie in this range; from 16 bands on it is fine enough
+    to keep PRI's 531 / 570 nm pair in separate bands.
+    """
+    return np.linspace(400.0, 1000.0, C)
+
+
+def make_synthetic_scene(out_dir, H, W, C, num_classes=4, seed=0):
+    """Writes a cube and label map with blocky class regions and class-specific spectra.
+
+    The cube is written through ``open_memmap`` so even very large scenes never
+    have to fit in memory. Returns ``(cube_path, label_path)``.
+    """
+    rng = np.random.default_rng(seed)
+    wl = synthetic_wavelengths(C)
+    # Vegetation-like signatures: red trough + red edge, scaled per class.
+    red_edge = 1.0 / (1.0 + np.exp(-(wl - 720.0) / 15.0))
+    signatures = np.stack([0.1 + (0.2 + 0.6 * k / max(1, num_classes - 1)) * red_edge + 0.05 * rng.random(C)
+                           for k in range(num_classes)]).astype(np.float32)
+
+    block = max(4, min(H, W) // 8)
+    coarse = rng.integers(0, num_classes + 1, size=(H // block + 1, W // block + 1))
+    labels = np.repeat(np.repeat(coarse, block, axis=0), block, axis=1)[:H, :W].astype(np.uint8)
+
+    cube_path = os.path.join(out_dir, f"synthetic_{H}x{W}x{C}.npy")
+    label_path = os.path.join(out_dir, f"synthetic_{H}x{W}x{C}_labels.npy")
+    cube = np.lib.format.open_memmap(cube_path, mode="w+", dtype=np.float32, shape=(H, W, C))
+    rows = max(1, (32 * 1024 * 1024) // (W * C * 4))
+    for r0 in range(0, H, rows):
+        lab = labels[r0:r0 + rows]
+        sig = signatures[np.maximum(lab.astype(np.int64) - 1, 0)]
+        cube[r0:r0 + rows] = sig + 0.03 * rng.standard_normal(sig.shape, dtype=np.float32)
+    cube.flush()
+    del cube
+    np.save(label_path, labels)
+    return cube_path, label_path
+
+
+# ======================
+# Stage timing
+# ======================
+def _stub_ollama(mh):
+    def chat(model, messages):
+        return {"message": {"content": json.dumps({
+            "problem_detected": False, "severity_level": "none",
+            "summary": "benchmark stub", "recommendations": [],
+        })}}
+    mh.ollama.chat = chat
+
+
+def train_dataloader(model, X, y, criterion, optimizer, epochs, batch_size):
+    """The DataLoader loop the pipeline trained with before ``train_model_fast``, kept as its baseline."""
+    from torch.utils.data import DataLoader, TensorDataset
+
+    loader = DataLoader(TensorDataset(X, y), batch_size=batch_size, shuffle=True)
+    model.train()
+    epoch_seconds = []
+    for _ in range(epochs):
+        start = time.perf_counter()
+        for inputs, labels in loader:
+            optimizer.zero_grad()
+            loss = criterion(model(inputs), labels)
+            loss.backward()
+            optimizer.step()
+        epoch_seconds.append(time.perf_counter() - start)
+    return {"epoch_seconds": epoch_seconds}
+
+
+def benchmark_scene(H, W, C, num_classes=4, epochs=5, batch_size=256, predict_workers=1, seed=0,
+                    export_mode="torchscript"):
+    """Times every pipeline stage for one synthetic scene; returns a JSON-ready dict.
+
+    The ``export`` stage converts the trained model with ``export_mode`` and
+    compares eager vs exported inference on the test split (``"none"`` skips it).
+    """
+    from . import model_hyperspectral as mh
+    from .model_export import benchmark_export, export_model
+    from .cube_loader import HyperspectralCube
+    from .inference import TiledPredictor
+    from .spectral_indices import IndexEngine
+    from sklearn.model_selection import train_test_split
+    import torch
+    import torch.nn as nn
+    import torch.optim as optim
+
+    _stub_ollama(mh)
+    stages = {}
+
+    def timed(name, fn):
+        if name not in STAGES:
+            raise ValueError(f"unknown benchmark stage {name!r}")
+        # With a reset high-water mark the peak belongs to this stage alone; elsewhere
+        # only the growth of the process-wide peak can be attributed to it.
+        isolated = reset_peak_rss()
+        before = peak_rss_mb()
+        start = time.perf_counter()
+        value = fn()
+        seconds = time.perf_counter() - start
+        after = peak_rss_mb()
+        if isolated:
+            stages[name] = {"seconds": seconds, "peak_rss_mb": after}
+        else:
+            stages[name] = {"seconds": seconds, "peak_rss_growth_mb": None if after is None else after - before}
+        return value
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cube_path, label_path = make_synthetic_scene(tmp, H, W, C, num_classes, seed)
+        params = {**mh.TRAIN_PARAMS, "epochs": epochs, "batch_size": batch_size}
+
+        def load():
+            cube = HyperspectralCube(cube_path)
+            cube.value_range
+            return cube
+        cube = timed("load_normalize", load)
+        labels = np.load(label_path)
+        valid_mask = labels > 0
+
+        def split():
+            X = cube.take(valid_mask)
+            y = (labels[valid_mask] - 1).astype(np.int64)
+            return train_test_split(X, y, test_size=params["test_size"], random_state=seed, stratify=y)
+        Xtr, Xte, ytr, yte = timed("split", split)
+        Xtr, Xte, ytr, yte = map(torch.from_numpy, (Xtr, Xte, ytr, yte))
+
+        torch.manual_seed(seed)
+        model = mh.PixelCNN(C, num_classes)
+        optimizer = optim.Adam(model.parameters(), lr=params["lr"])
+        history = timed("train", lambda: mh.train_model_fast(model, Xtr, ytr, nn.CrossEntropyLoss(), optimizer,
+                                                             epochs=epochs, batch_size=batch_size, seed=seed))
+        torch.manual_seed(seed)
+        legacy = mh.PixelCNN(C, num_classes)
+        legacy_history = timed("train_dataloader", lambda: train_dataloader(
+            legacy, Xtr, ytr, nn.CrossEntropyLoss(), optim.Adam(legacy.parameters(), lr=params["lr"]),
+            epochs, batch_size))
+        accuracy = timed("evaluate", lambda: mh.evaluate_tensors(model, Xte, yte))
+        export = None
+        if export_mode != "none":
+            export = timed("export", lambda: {"mode": export_mode, **benchmark_export(
+                model, export_model(model, export_mode), Xte.numpy(), yte.numpy())})
+
+        predictor = TiledPredictor(model, workers=predict_workers)
+        pred_map, inference = timed("predict", lambda: predictor.predict(cube, valid_mask))
+        engine = IndexEngine(synthetic_wavelengths(C))
+        indices = timed("indices", lambda: engine.compute(cube))
+        timed("render", lambda: mh.visualize_overlay(indices["ndvi"], indices["lci"], pred_map,
+                                                      os.path.join(tmp, "overlay.png")))
+        timed("end_to_end", lambda: mh.run_hyperspectral_analysis(
+            cube_path, label_path, tmp, predict_workers=predict_workers, wavelengths=synthetic_wavelengths(C),
+            train_params={"epochs": epochs, "batch_size": batch_size}, export_mode="none"))
+
+    return {
+        "size": [H, W, C],
+        "classes": num_classes,
+        "epochs": epochs,
+        "accuracy": float(accuracy),
+        "predict_pixels_per_sec": inference["pixels_per_sec"],
+        "epoch_seconds": {"fast": float(np.mean(history["epoch_seconds"])),
+                          "dataloader": float(np.mean(legacy_history["epoch_seconds"]))},
+        "export": export,
+        "stages": {name: stages[name] for name in STAGES if name in stages},
+    }
+
+
+# ======================
+# Regression comparison
+# ======================
+def compare(current, previous, tolerance=0.2):
+    """Stages that got slower than ``previous`` by more than ``tolerance`` (fraction)."""
+    old = {tuple(r["size"]): r for r in previous["results"]}
+    regressions = []
+    for r in current["results"]:
+        base = old.get(tuple(r["size"]))
+        if base is None:
+            continue
+        for stage in STAGES:
+            info = r["stages"].get(stage)
+            before = base["stages"].get(stage, {}).get("seconds")
+            if info is None:
+                continue
+            if before and info["seconds"] > before * (1 + tolerance):
+                regressions.append({"size": r["size"], "stage": stage, "before": before,
+                                    "after": info["seconds"], "ratio": info["seconds"] / before})
+    return regressions
+
+
+def parse_size(text):
+    H, W, C = (int(v) for v in text.lower().split("x"))
+    return H, W, C
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--sizes", default="64x64x32,128x128x64", help="comma-separated HxWxC list")
+    ap.add_argument("--classes", type=int, default=4)
+    ap.add_argument("--epochs", type=int, default=5)
+    ap.add_argument("--batch-size", type=int, default=256)
+    ap.add_argument("--predict-workers", type=int, default=1)
+    ap.add_argument("--export-mode", default="torchscript", choices=("none", "torchscript", "quantized"),
+                    help="model export whose inference speedup is measured")
+    ap.add_argument("--out", default="bench_hyperspectral.json")
+    ap.add_argument("--compare", help="previous JSON results to check for regressions")
+    ap.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown before a stage is flagged")
+    args = ap.parse_args(argv)
+
+    results = []
+    ctx = multiprocessing.get_context("spawn")
+    for size in args.sizes.split(","):
+        H, W, C = parse_size(size)
+        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+            r = pool.submit(benchmark_scene, H, W, C, args.classes, args.epochs,
+                            args.batch_size, args.predict_workers, export_mode=args.export_mode).result()
+        results.append(r)
+        print(f"{H}x{W}x{C}: " + ", ".join(f"{k}={v['seconds']:.3f}s" for k, v in r["stages"].items()))
+        epoch = r["epoch_seconds"]
+        print(f"  epoch: {epoch['fast']:.3f}s vs {epoch['dataloader']:.3f}s with DataLoader "
+              f"({epoch['dataloader'] / epoch['fast']:.1f}x)")
+        if r["export"]:
+            ex = r["export"]
+            print(f"  {ex['mode']}: {ex['speedup']:.2f}x vs eager, accuracy delta {ex['accuracy_delta']:+.4f}")
+
+    import torch
+    report = {
+        "env": {"python": platform.python_version(), "platform": platform.platform(),
+                "torch": torch.__version__, "numpy": np.__version__, "torch_threads": torch.get_num_threads()},
+        "results": results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for reg in regressions:
+            print(f"REGRESSION {reg['size']} {reg['stage']}: {reg['before']:.3f}s -> {reg['after']:.3f}s ({reg['ratio']:.2f}x)")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
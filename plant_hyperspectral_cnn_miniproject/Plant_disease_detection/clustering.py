@@ -0,0 +1,133 @@
+# clustering.py
+import os
+
+import numpy as np
+
+
+DEFAULT_CLUSTERS = int(os.getenv("PLANT_CLUSTERS", 5))
+# Upper bound on pixels visited while fitting; larger cubes are subsampled per block.
+DEFAULT_FIT_PIXELS = 200_000
+# Small cubes are revisited until the centres have seen at least this many mini-batches.
+MIN_UPDATES = 30
+
+
+# ======================
+# Mini-batch k-means
+# ======================
+class StreamingKMeans:
+    """Mini-batch k-means (Sculley, 2010) over pixel spectra, one chunk at a time.
+
+    Each mini-batch assigns its pixels to the nearest centre and moves every
+    centre towards the mean of its pixels with a per-centre learning rate of
+    1 / (pixels seen), so fitting needs one chunk plus ``n_clusters x C``
+    floats and never the whole cube. Seeding draws at most ``batch_size``
+    spectra from the first chunk, which bounds it to a mini-batch as well.
+    """
+
+    def __init__(self, n_clusters=DEFAULT_CLUSTERS, batch_size=2048, max_pixels=DEFAULT_FIT_PIXELS, n_init=3, seed=0):
+        self.n_clusters = int(n_clusters)
+        self.n_init = int(n_init)
+        self.batch_size = int(batch_size)
+        self.max_pixels = int(max_pixels)
+        self.rng = np.random.default_rng(seed)
+        self.centers = None
+        self.counts = None
+        self.updates = 0
+
+    def _seed(self, X):
+        # Greedy k-means++: of a few candidates drawn proportionally to D^2,
+        # keep the one that lowers the potential most. Candidates are scored
+        # one at a time, so the temporaries stay at len(X) x C.
+        trials = 2 + int(np.log(self.n_clusters))
+        centers = [X[self.rng.integers(len(X))]]
+        d2 = ((X - centers[0]) ** 2).sum(axis=1)
+        for _ in range(1, self.n_clusters):
+            total = d2.sum()
+            if total <= 0:
+                cand = self.rng.integers(len(X), size=1)
+            else:
+                cand = self.rng.choice(len(X), size=trials, p=d2 / total)
+            best = None
+            for c in cand:
+                c_d2 = np.minimum(d2, ((X - X[c]) ** 2).sum(axis=1))
+                potential = float(c_d2.sum())
+                if best is None or potential < best[0]:
+                    best = (potential, c, c_d2)
+            centers.append(X[best[1]])
+            d2 = best[2]
+        return np.array(centers, dtype=np.float32), float(d2.sum())
+
+    def _init_centers(self, X):
+        # Seed from one mini-batch worth of spectra, keeping the best of a few attempts.
+        if len(X) > self.batch_size:
+            X = X[self.rng.choice(len(X), size=self.batch_size, replace=False)]
+        self.centers = min((self._seed(X) for _ in range(self.n_init)), key=lambda seeded: seeded[1])[0]
+        self.counts = np.zeros(self.n_clusters, dtype=np.float64)
+
+    def partial_fit(self, X):
+        X = np.asarray(X, dtype=np.float32).reshape(-1, X.shape[-1])
+        if self.centers is None:
+            if len(X) < self.n_clusters:
+                return self
+            self._init_centers(X)
+        for s in range(0, len(X), self.batch_size):
+            batch = X[s:s + self.batch_size]
+            labels = self.predict(batch)
+            onehot = np.zeros((self.n_clusters, len(batch)), dtype=np.float32)
+            onehot[labels, np.arange(len(batch))] = 1.0
+            n = onehot.sum(axis=1)
+            hit = n > 0
+            self.counts += n
+            sums = onehot @ batch
+            self.centers[hit] += (sums[hit] - n[hit, None] * self.centers[hit]) / self.counts[hit, None].astype(np.float32)
+            self.updates += 1
+        return self
+
+    def fit_source(self, source):
+        """Fits over a ``HyperspectralCube`` (streamed) or an in-memory H x W x C array.
+
+        At most ``max_pixels`` spectra are drawn (uniformly, block by block);
+        when that is only a few mini-batches the blocks are visited again.
+        """
+        blocks = source.iter_blocks if hasattr(source, "iter_blocks") else (lambda: [(0, len(source), source)])
+        H, W = source.shape[:2]
+        frac = min(1.0, self.max_pixels / max(1, H * W))
+        per_pass = max(1, int(np.ceil(H * W * frac / self.batch_size)))
+        passes = max(1, min(10, int(np.ceil(MIN_UPDATES / per_pass))))
+        for _ in range(passes):
+            for _, _, block in blocks():
+                X = block.reshape(-1, block.shape[-1])
+                if frac < 1.0:
+                    idx = np.flatnonzero(self.rng.random(len(X)) < frac)
+                    self.rng.shuffle(idx)
+                else:
+                    idx = self.rng.permutation(len(X))
+                # Gather one shuffled mini-batch at a time instead of a shuffled copy of the chunk.
+                for s in range(0, len(idx), self.batch_size):
+                    self.partial_fit(X[idx[s:s + self.batch_size]])
+        if self.centers is None:
+            raise ValueError(f"need at least {self.n_clusters} pixels to form {self.n_clusters} clusters")
+        return self
+
+    def predict(self, X):
+        """Index of the nearest centre for every spectrum in ``X`` (N x C)."""
+        X = np.asarray(X, dtype=np.float32)
+        # ||x - c||^2 up to the per-row ||x||^2 term, which does not change the argmin
+        d = (self.centers ** 2).sum(axis=1)[None, :] - 2.0 * (X @ self.centers.T)
+        return d.argmin(axis=1)
+
+    __call__ = predict
+
+
+def order_by_index(cluster_map, values, n_clusters):
+    """Renumbers clusters by descending mean of ``values`` (e.g. NDVI), so cluster 0
+    is the most vegetated, like class 0 in a supervised map. Returns the new map
+    and per-cluster ``(pixels, mean)`` in the new order."""
+    ids = cluster_map.ravel().astype(np.int64)
+    counts = np.bincount(ids, minlength=n_clusters)
+    sums = np.bincount(ids, weights=np.asarray(values, dtype=np.float64).ravel(), minlength=n_clusters)
+    means = np.where(counts > 0, sums / np.maximum(counts, 1), -np.inf)
+    order = np.argsort(-means, kind="stable")
+    remap = np.empty(n_clusters, dtype=cluster_map.dtype)
+    remap[order] = np.arange(n_clusters)
+    return remap[cluster_map], counts[order], means[order]
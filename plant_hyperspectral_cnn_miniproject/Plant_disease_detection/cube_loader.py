@@ -0,0 +1,96 @@
+# cube_loader.py
+import os
+
+import numpy as np
+
+from .envi import open_envi, find_header, find_data_file
+
+
+# Upper bound for one normalized float32 block handed to downstream stages.
+DEFAULT_CHUNK_BYTES = 64 * 1024 * 1024
+
+
+# ======================
+# Memory-mapped cube
+# ======================
+class HyperspectralCube:
+    """Lazy, memory-mapped view of an H x W x C cube stored as ``.npy`` or ENVI.
+
+    The raw array is never loaded as a whole: the global min/max is found in
+    row chunks and normalized float32 blocks are produced on demand, so peak
+    memory follows ``chunk_bytes`` instead of the cube size.
+
+    ENVI images are opened from their ``.hdr`` (or from the ``.raw``/``.img``
+    with ``header`` given or a ``.hdr`` beside it) and mapped in place in any
+    interleave; ``wavelengths`` then holds the header's band centres in nm.
+    """
+
+    def __init__(self, path, chunk_bytes=DEFAULT_CHUNK_BYTES, header=None):
+        self.path = path
+        self.data_path = path
+        self.header_path = None
+        self.wavelengths = None
+        if header is None and not path.lower().endswith(".npy"):
+            header = path if path.lower().endswith(".hdr") else find_header(path)
+        if header is not None:
+            if os.path.abspath(path) == os.path.abspath(header):
+                self.data_path = find_data_file(header)
+            self.raw, self.wavelengths, _ = open_envi(header, self.data_path)
+            self.header_path = header
+        else:
+            self.raw = np.load(path, mmap_mode="r")
+        if self.raw.ndim != 3:
+            raise ValueError(f"Expected an H x W x C cube, got shape {self.raw.shape}")
+        self.shape = tuple(int(s) for s in self.raw.shape)
+        H, W, C = self.shape
+        row_bytes = max(1, W * C * np.dtype(np.float32).itemsize)
+        self.rows_per_chunk = max(1, int(chunk_bytes) // row_bytes)
+        self._range = None
+
+    def row_chunks(self):
+        H = self.shape[0]
+        for r0 in range(0, H, self.rows_per_chunk):
+            yield r0, min(H, r0 + self.rows_per_chunk)
+
+    @property
+    def value_range(self):
+        if self._range is None:
+            lo, hi = np.inf, -np.inf
+            for r0, r1 in self.row_chunks():
+                raw = self.raw[r0:r1]
+                lo = min(lo, float(raw.min()))
+                hi = max(hi, float(raw.max()))
+            self._range = (lo, hi)
+        return self._range
+
+    def normalize(self, raw):
+        lo, hi = self.value_range
+        block = np.array(raw, dtype=np.float32, order="C")
+        block -= np.float32(lo)
+        block *= np.float32(1.0 / (hi - lo + 1e-12))
+        return block
+
+    def block(self, r0, r1):
+        return self.normalize(self.raw[r0:r1])
+
+    def iter_blocks(self):
+        for r0, r1 in self.row_chunks():
+            yield r0, r1, self.block(r0, r1)
+
+    def take(self, mask):
+        """Normalized float32 spectra of the pixels where ``mask`` is set, in row-major order."""
+        mask = np.asarray(mask, dtype=bool)
+        C = self.shape[2]
+        out = np.empty((int(mask.sum()), C), dtype=np.float32)
+        pos = 0
+        for r0, r1 in self.row_chunks():
+            m = mask[r0:r1]
+            n = int(m.sum())
+            if n:
+                out[pos:pos + n] = self.normalize(self.raw[r0:r1][m])
+                pos += n
+        return out
+
+    def band(self, idx):
+        return self.normalize(self.raw[:, :, idx])
+
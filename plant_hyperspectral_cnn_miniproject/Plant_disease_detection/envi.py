@@ -0,0 +1,118 @@
+# envi.py
+import os
+import re
+
+import numpy as np
+
+
+DATA_EXTENSIONS = (".raw", ".img", ".dat", ".bil", ".bip", ".bsq", "")
+
+# ENVI "data type" codes
+ENVI_DTYPES = {
+    1: np.uint8, 2: np.int16, 3: np.int32, 4: np.float32, 5: np.float64,
+    12: np.uint16, 13: np.uint32, 14: np.int64, 15: np.uint64,
+}
+
+# File axis order per interleave, and the transpose that turns it into H x W x C.
+INTERLEAVES = {
+    "bsq": (("bands", "lines", "samples"), (1, 2, 0)),
+    "bil": (("lines", "bands", "samples"), (0, 2, 1)),
+    "bip": (("lines", "samples", "bands"), (0, 1, 2)),
+}
+
+
+class EnviHeaderError(ValueError):
+    pass
+
+
+# ======================
+# Header
+# ======================
+def parse_header(text):
+    """Key/value pairs of an ENVI ``.hdr``; ``{...}`` values may span lines."""
+    if not text.lstrip().startswith("ENVI"):
+        raise EnviHeaderError("not an ENVI header (missing 'ENVI' magic)")
+    header = {}
+    for m in re.finditer(r"^\s*([^=\n]+?)\s*=\s*(\{[^}]*\}|[^\n]*)", text, re.MULTILINE):
+        key, value = m.group(1).strip().lower(), m.group(2).strip()
+        if value.startswith("{"):
+            value = [v.strip() for v in value[1:-1].split(",")]
+            value = [v for v in value if v]
+        header[key] = value
+    return header
+
+
+def read_header(path):
+    with open(path, "r", errors="replace") as f:
+        return parse_header(f.read())
+
+
+def header_wavelengths(header):
+    """Band centres in nm, or None when the header carries no usable table."""
+    values = header.get("wavelength")
+    if not values:
+        return None
+    try:
+        wl = np.array([float(v) for v in values], dtype=np.float64)
+    except ValueError:
+        return None
+    units = str(header.get("wavelength units", "")).lower()
+    if units.startswith("micro") or units == "um" or (not units and wl.max() < 100):
+        wl = wl * 1000.0
+    return wl
+
+
+def find_data_file(header_path):
+    stem = os.path.splitext(header_path)[0]
+    for ext in DATA_EXTENSIONS:
+        for candidate in (stem + ext, stem + ext.upper()):
+            if candidate != header_path and os.path.isfile(candidate):
+                return candidate
+    raise FileNotFoundError(f"No ENVI data file found next to {header_path}")
+
+
+def find_header(data_path):
+    stem = os.path.splitext(data_path)[0]
+    for candidate in (stem + ".hdr", data_path + ".hdr", stem + ".HDR"):
+        if os.path.isfile(candidate):
+            return candidate
+    return None
+
+
+# ======================
+# Lazy cube view
+# ======================
+def open_envi(header_path, data_path=None):
+    """Memory-maps an ENVI image and returns ``(raw, wavelengths, header)``.
+
+    ``raw`` is an H x W x C strided view over the file in whatever interleave
+    it was written (BSQ, BIL or BIP); nothing is read until a slice of it is.
+    ``wavelengths`` is in nm (None if the header has none).
+    """
+    header = read_header(header_path)
+    data_path = data_path or find_data_file(header_path)
+    try:
+        dims = {k: int(header[k]) for k in ("lines", "samples", "bands")}
+        code = int(header.get("data type", 4))
+        offset = int(header.get("header offset", 0))
+        big_endian = int(header.get("byte order", 0)) == 1
+    except (KeyError, ValueError) as e:
+        raise EnviHeaderError(f"incomplete ENVI header {header_path}: {e}") from e
+    if code not in ENVI_DTYPES:
+        raise EnviHeaderError(f"unsupported ENVI data type {code}")
+    interleave = str(header.get("interleave", "bsq")).lower()
+    if interleave not in INTERLEAVES:
+        raise EnviHeaderError(f"unsupported interleave {interleave!r}")
+
+    dtype = np.dtype(ENVI_DTYPES[code]).newbyteorder(">" if big_endian else "<")
+    axes, to_hwc = INTERLEAVES[interleave]
+    shape = tuple(dims[a] for a in axes)
+    expected = offset + int(np.prod(shape)) * dtype.itemsize
+    if os.path.getsize(data_path) < expected:
+        raise EnviHeaderError(f"{data_path} is smaller than its header describes ({expected} bytes)")
+
+    raw = np.memmap(data_path, dtype=dtype, mode="r", offset=offset, shape=shape).transpose(to_hwc)
+    wavelengths = header_wavelengths(header)
+    if wavelengths is not None and len(wavelengths) != dims["bands"]:
+        wavelengths = None
+    return raw, wavelengths, header
@@ -0,0 +1,114 @@
+# inference.py
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import torch
+
+
+DEFAULT_BATCH_SIZE = int(os.getenv("PLANT_PREDICT_BATCH_SIZE", 8192))
+DEFAULT_WORKERS = int(os.getenv("PLANT_PREDICT_WORKERS", 1))
+DEFAULT_TILE_ROWS = 64
+
+
+# ======================
+# Batched pixel inference
+# ======================
+def predict_pixels(model, pixels, batch_size=DEFAULT_BATCH_SIZE, out=None, fetch=None):
+    """Class index of every spectrum in ``pixels`` (N x C), written into a uint8 array.
+
+    Only ``batch_size`` spectra go through the model at a time, so the conv
+    activations stay at batch_size x 32 x C floats whatever the scene size.
+    With ``fetch``, ``pixels`` holds flat pixel indices and ``fetch(batch)``
+    builds the model input (e.g. spatial patches) for each batch.
+    """
+    n = len(pixels)
+    if out is None:
+        out = np.empty(n, dtype=np.uint8)
+    with torch.inference_mode():
+        for s in range(0, n, batch_size):
+            if fetch is not None:
+                xb = fetch(pixels[s:s + batch_size])
+            else:
+                xb = torch.from_numpy(np.ascontiguousarray(pixels[s:s + batch_size], dtype=np.float32))
+            out[s:s + len(xb)] = model(xb).argmax(dim=1).numpy()
+    return out
+
+
+# ======================
+# Tiled full-scene engine
+# ======================
+class TiledPredictor:
+    """Runs a trained model over a scene tile by tile.
+
+    ``source`` is either a ``HyperspectralCube`` (tiles follow its row chunks)
+    or an in-memory H x W x C array (tiles of ``tile_rows`` rows). Tiles are
+    optionally spread over a thread pool; torch releases the GIL during the
+    forward pass, and every tile writes a disjoint slice of the output map.
+    ``transform`` (e.g. a fitted PCA projection) maps the N x C spectra of a
+    tile to the model's input features; with ``patches`` (a ``PatchView``) the
+    model is fed spatial neighbourhoods gathered per batch instead.
+    """
+
+    def __init__(self, model, batch_size=DEFAULT_BATCH_SIZE, workers=DEFAULT_WORKERS, tile_rows=DEFAULT_TILE_ROWS,
+                 transform=None, patches=None):
+        self.model = model
+        self.transform = transform
+        self.patches = patches
+        self.batch_size = max(1, int(batch_size))
+        self.workers = max(1, int(workers))
+        self.tile_rows = max(1, int(tile_rows))
+
+    def _tiles(self, source):
+        if hasattr(source, "row_chunks"):
+            for r0, r1 in source.row_chunks():
+                yield r0, r1, (lambda r0=r0, r1=r1: source.block(r0, r1))
+        else:
+            H = source.shape[0]
+            for r0 in range(0, H, self.tile_rows):
+                r1 = min(H, r0 + self.tile_rows)
+                yield r0, r1, (lambda r0=r0, r1=r1: np.asarray(source[r0:r1], dtype=np.float32))
+
+    def predict(self, source, mask_valid, on_tile=None):
+        """Returns ``(prediction_map, stats)``.
+
+        ``on_tile(r0, r1, block)`` is called with every normalized tile so other
+        per-pixel stages can share the same pass over the data.
+        """
+        H, W = source.shape[:2]
+        mask_valid = np.asarray(mask_valid, dtype=bool)
+        pred_map = np.zeros((H, W), dtype=np.uint8)
+        self.model.eval()
+
+        def run(tile):
+            r0, r1, load = tile
+            block = load()
+            m = mask_valid[r0:r1]
+            if m.any() and self.patches is not None:
+                rows, cols = np.nonzero(m)
+                flat = (rows + r0) * W + cols
+                pred_map[r0:r1][m] = predict_pixels(self.model, flat, self.batch_size, fetch=self.patches.fetch)
+            elif m.any():
+                pixels = block[m] if self.transform is None else self.transform(block[m])
+                pred_map[r0:r1][m] = predict_pixels(self.model, pixels, self.batch_size)
+            if on_tile is not None:
+                on_tile(r0, r1, block)
+            return int(m.sum())
+
+        start = time.perf_counter()
+        if self.workers == 1:
+            pixels = sum(run(t) for t in self._tiles(source))
+        else:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                pixels = sum(pool.map(run, self._tiles(source)))
+        seconds = time.perf_counter() - start
+
+        stats = {
+            "pixels": pixels,
+            "seconds": seconds,
+            "pixels_per_sec": pixels / seconds if seconds > 0 else None,
+            "batch_size": self.batch_size,
+            "workers": self.workers,
+        }
+        return pred_map, stats
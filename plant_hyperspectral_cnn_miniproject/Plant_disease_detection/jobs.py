@@ -0,0 +1,124 @@
+# jobs.py
+import os
+import time
+import uuid
+import threading
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+STAGES = ("load", "train", "predict", "render", "summarize")
+
+DEFAULT_WORKERS = int(os.getenv("PLANT_JOB_WORKERS", 1))
+DEFAULT_MAX_PENDING = int(os.getenv("PLANT_JOB_MAX_PENDING", 8))
+DEFAULT_HISTORY = int(os.getenv("PLANT_JOB_HISTORY", 100))
+
+
+class JobQueueFull(RuntimeError):
+    pass
+
+
+# ======================
+# Job record
+# ======================
+class Job:
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.status = "queued"
+        self.stage = None
+        self.stages = OrderedDict((s, {"state": "pending", "seconds": None}) for s in STAGES)
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self._stage_start = None
+
+    def enter_stage(self, stage):
+        now = time.time()
+        self._close_stage(now)
+        self.stage = stage
+        self.stages.setdefault(stage, {"state": "pending", "seconds": None})["state"] = "running"
+        self._stage_start = now
+
+    def _close_stage(self, now):
+        if self.stage is not None and self._stage_start is not None:
+            info = self.stages[self.stage]
+            info["state"] = "done"
+            info["seconds"] = now - self._stage_start
+        self._stage_start = None
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "status": self.status,
+            "stage": self.stage,
+            "stages": [{"name": name, **info} for name, info in self.stages.items()],
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+
+
+# ======================
+# Worker pool
+# ======================
+class JobManager:
+    """Runs analyses on a bounded thread pool and keeps their state for polling.
+
+    ``fn`` is called with an extra ``progress`` keyword; calling
+    ``progress(stage)`` marks the previous stage done and the new one running.
+    At most ``max_pending`` jobs may be queued or running at once, and only the
+    ``history`` most recent jobs are remembered.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, max_pending=DEFAULT_MAX_PENDING, history=DEFAULT_HISTORY):
+        self.workers = max(1, int(workers))
+        self.max_pending = max(1, int(max_pending))
+        self.history = max(1, int(history))
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="plant-job")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _active(self):
+        return sum(1 for j in self._jobs.values() if j.status in ("queued", "running"))
+
+    def submit(self, fn, *args, **kwargs):
+        job = Job()
+        with self._lock:
+            if self._active() >= self.max_pending:
+                raise JobQueueFull(f"{self.max_pending} analyses already queued or running")
+            self._jobs[job.id] = job
+            self._trim()
+        self._pool.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def _run(self, job, fn, args, kwargs):
+        job.status = "running"
+        job.started_at = time.time()
+        status = "error"
+        try:
+            job.result = fn(*args, progress=job.enter_stage, **kwargs)
+            status = "done"
+        except Exception as e:
+            traceback.print_exc()
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            job._close_stage(job.finished_at)
+            if status == "done":
+                for info in job.stages.values():
+                    if info["state"] == "pending":
+                        info["state"] = "skipped"
+            job.status = status
+
+    def _trim(self):
+        finished = [k for k, j in self._jobs.items() if j.status in ("done", "error")]
+        while len(self._jobs) > self.history and finished:
+            del self._jobs[finished.pop(0)]
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
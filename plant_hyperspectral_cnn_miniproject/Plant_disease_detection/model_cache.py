@@ -0,0 +1,126 @@
+# model_cache.py
+import os
+import json
+import hashlib
+import threading
+
+import torch
+
+
+DEFAULT_MAX_BYTES = int(os.getenv("PLANT_MODEL_CACHE_MB", 512)) * 1024 * 1024
+
+
+def file_digest(path, chunk_size=1024 * 1024):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def cache_key(data_path, label_path, params, header_path=None, digests=None):
+    """Content address of a trained model: cube bytes (+ ENVI header) + label bytes + training hyperparameters.
+
+    ``digests`` maps paths to SHA-256 hex digests that are already known (e.g.
+    content-addressed artifacts), so multi-GB cubes are not read again just to key the model.
+    """
+    known = {os.path.abspath(p): d for p, d in (digests or {}).items()}
+
+    def digest(path):
+        return known.get(os.path.abspath(path)) or file_digest(path)
+
+    h = hashlib.sha256()
+    h.update(digest(data_path).encode())
+    if header_path:
+        h.update(digest(header_path).encode())
+    h.update(digest(label_path).encode())
+    h.update(json.dumps(params, sort_keys=True).encode())
+    return h.hexdigest()
+
+
+# ======================
+# On-disk LRU registry
+# ======================
+class ModelCache:
+    """Trained ``PixelCNN`` weights on disk, one ``<key>.pt`` file per entry.
+
+    Each entry stores the ``state_dict`` together with accuracy and class count;
+    exported TorchScript variants live next to it as ``<key>.<mode>.pt``.
+    Recency is tracked through the file mtime (touched on every hit) and the
+    least recently used entries are evicted once the directory exceeds
+    ``max_bytes``.
+    """
+
+    def __init__(self, root, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.root, f"{key}.pt")
+
+    def get(self, key):
+        path = self._path(key)
+        with self._lock:
+            if not os.path.exists(path):
+                return None
+            try:
+                entry = torch.load(path, map_location="cpu", weights_only=True)
+            except Exception:
+                os.remove(path)
+                return None
+            os.utime(path)
+        return entry
+
+    def put(self, key, state_dict, accuracy, num_classes, **extra):
+        entry = {
+            "state_dict": {k: v.detach().cpu() for k, v in state_dict.items()},
+            "accuracy": accuracy,
+            "num_classes": num_classes,
+            **extra,
+        }
+        path = self._path(key)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with self._lock:
+            torch.save(entry, tmp)
+            os.replace(tmp, path)
+            self._evict(keep=path)
+
+    def get_export(self, key, mode):
+        path = self._path(f"{key}.{mode}")
+        with self._lock:
+            if not os.path.exists(path):
+                return None
+            try:
+                module = torch.jit.load(path, map_location="cpu")
+            except Exception:
+                os.remove(path)
+                return None
+            os.utime(path)
+        return module
+
+    def put_export(self, key, mode, module):
+        path = self._path(f"{key}.{mode}")
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with self._lock:
+            torch.jit.save(module, tmp)
+            os.replace(tmp, path)
+            self._evict(keep=path)
+
+    def _evict(self, keep=None):
+        entries = []
+        for name in os.listdir(self.root):
+            if not name.endswith(".pt"):
+                continue
+            p = os.path.join(self.root, name)
+            st = os.stat(p)
+            entries.append((st.st_mtime, st.st_size, p))
+        total = sum(size for _, size, _ in entries)
+        for _, size, p in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if p == keep:
+                continue
+            os.remove(p)
+            total -= size
@@ -0,0 +1,59 @@
+# model_export.py
+import os
+import time
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from .inference import predict_pixels
+
+
+EXPORT_MODES = ("none", "torchscript", "quantized")
+DEFAULT_EXPORT_MODE = os.getenv("PLANT_EXPORT_MODE", "torchscript")
+
+
+# ======================
+# Export
+# ======================
+def export_model(model, mode=DEFAULT_EXPORT_MODE):
+    """TorchScript version of a trained model; ``quantized`` also converts the Linear layers to dynamic int8."""
+    if mode not in EXPORT_MODES or mode == "none":
+        raise ValueError(f"Unknown export mode {mode!r}, expected one of {EXPORT_MODES[1:]}")
+    model.eval()
+    if mode == "quantized":
+        model = torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+    return torch.jit.script(model)
+
+
+def benchmark_export(model, exported, X, y=None, batch_size=4096, repeats=3, fetch=None):
+    """Times eager vs exported inference on ``X`` and reports speedup and accuracy delta.
+
+    ``agreement`` is the fraction of pixels where both models predict the same class.
+    ``fetch`` is forwarded to ``predict_pixels`` when ``X`` holds pixel indices.
+    """
+    X = np.asarray(X) if fetch is not None else np.asarray(X, dtype=np.float32)
+    model.eval()
+    runs = {}
+    for name, m in (("eager", model), ("exported", exported)):
+        predict_pixels(m, X[:batch_size], batch_size, fetch=fetch)  # warm-up
+        start = time.perf_counter()
+        for _ in range(repeats):
+            preds = predict_pixels(m, X, batch_size, fetch=fetch)
+        seconds = (time.perf_counter() - start) / repeats
+        runs[name] = {"seconds": seconds, "pixels_per_sec": len(X) / seconds if seconds > 0 else None, "preds": preds}
+
+    eager, exported_run = runs["eager"], runs["exported"]
+    report = {
+        "pixels": len(X),
+        "eager_seconds": eager["seconds"],
+        "exported_seconds": exported_run["seconds"],
+        "speedup": eager["seconds"] / exported_run["seconds"] if exported_run["seconds"] > 0 else None,
+        "agreement": float(np.mean(eager["preds"] == exported_run["preds"])) if len(X) else None,
+    }
+    if y is not None and len(X):
+        y = np.asarray(y)
+        report["eager_accuracy"] = float(np.mean(eager["preds"] == y))
+        report["exported_accuracy"] = float(np.mean(exported_run["preds"] == y))
+        report["accuracy_delta"] = report["exported_accuracy"] - report["eager_accuracy"]
+    return report
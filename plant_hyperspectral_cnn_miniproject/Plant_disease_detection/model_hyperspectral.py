@@ -1,15 +1,12 @@
 # model_hyperspectral.py
 import os
 import json
+import time
 import numpy as np
-import matplotlib
-matplotlib.use("Agg")  # render without display
-import matplotlib.pyplot as plt
 
 import torch
 import torch.nn as nn
 import torch.optim as optim
-from torch.utils.data import Dataset, DataLoader
 import torch.nn.functional as F
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score
@@ -17,30 +14,33 @@ from sklearn.metrics import accuracy_score
 # ✅ Tiny model, light on CPU
 import ollama
 
+from .cube_loader import HyperspectralCube
+from .inference import DEFAULT_BATCH_SIZE, DEFAULT_WORKERS, TiledPredictor
+from .model_cache import cache_key
+from .spectral_indices import IndexEngine
+from .render import DEFAULT_MODE as DEFAULT_RENDER_MODE, encode_png, render_panels
+from .band_reduction import StreamingPCA
+from .model_export import DEFAULT_EXPORT_MODE, export_model
+from .patches import PatchView
+from .zonal_stats import zonal_statistics, class_zones
+from .sampling import stratified_sample
+from .clustering import DEFAULT_CLUSTERS, StreamingKMeans, order_by_index
+from .raster_export import encode_npy, encode_npz, rle_encode
+from .summaries import SummaryService
+from .tiles import tileset_spec
+
 
 # ======================
-# Dataset + CNN Model
+# CNN Models
 # ======================
-class HyperspectralDataset(Dataset):
-    def __init__(self, X, y):
-        self.X = X
-        self.y = y
-
-    def __getitem__(self, idx):
-        return self.X[idx], self.y[idx]
-
-    def __len__(self):
-        return len(self.X)
-
-
 class PixelCNN(nn.Module):
-    def __init__(self, in_channels, num_classes):
+    def __init__(self, in_channels, num_classes, dropout=0.5):
         super().__init__()
         self.conv1 = nn.Conv1d(1, 16, 3, padding=1)
         self.conv2 = nn.Conv1d(16, 32, 3, padding=1)
         self.fc1 = nn.Linear(32 * in_channels, 128)
         self.fc2 = nn.Linear(128, num_classes)
-        self.dropout = nn.Dropout(0.5)
+        self.dropout = nn.Dropout(dropout)
 
     def forward(self, x):
         x = x.unsqueeze(1)
@@ -52,64 +52,164 @@ class PixelCNN(nn.Module):
         return self.fc2(x)
 
 
+class PatchCNN(nn.Module):
+    """Spatial-spectral classifier over k x k neighbourhoods (input N x C x k x k)."""
+
+    def __init__(self, in_channels, num_classes, patch_size=5, dropout=0.5):
+        super().__init__()
+        self.conv1 = nn.Conv2d(in_channels, 64, 1)
+        self.conv2 = nn.Conv2d(64, 64, 3, padding=1)
+        self.fc1 = nn.Linear(64 * patch_size * patch_size, 128)
+        self.fc2 = nn.Linear(128, num_classes)
+        self.dropout = nn.Dropout(dropout)
+
+    def forward(self, x):
+        x = F.relu(self.conv1(x))
+        x = F.relu(self.conv2(x))
+        x = x.view(x.size(0), -1)
+        x = F.relu(self.fc1(x))
+        x = self.dropout(x)
+        return self.fc2(x)
+
+
+def build_model(params, in_channels, num_classes):
+    if params.get("model", "pixel") == "patch":
+        return PatchCNN(in_channels, num_classes, patch_size=params["patch_size"], dropout=params.get("dropout", 0.5))
+    return PixelCNN(in_channels, num_classes, dropout=params.get("dropout", 0.5))
+
+
 # ======================
 # Training & Evaluation
 # ======================
-def train_model(model, loader, criterion, optimizer, epochs=20):
-    model.train()
+def train_model_fast(model, X, y, criterion, optimizer, epochs=20, batch_size=256, seed=42, fetch=None,
+                     val=None, patience=None, time_budget=None):
+    """Mini-batch training over whole tensors (no DataLoader).
+
+    Each epoch permutes ``X``/``y`` once into preallocated buffers with
+    ``index_select``; batches are then contiguous slices (views) of those
+    buffers, so there is no per-sample ``__getitem__`` or Python collation.
+    With ``fetch``, ``X`` holds flat pixel indices and ``fetch(batch)`` builds
+    the model input for each batch (e.g. ``PatchView.fetch``).
+
+    ``epochs`` is a cap. With ``val=(Xv, yv)`` the model is scored after every
+    epoch, training stops once validation accuracy has not improved for
+    ``patience`` epochs, and the best epoch's weights are restored at the end.
+    ``time_budget`` (seconds) stops before an epoch that would not fit in the
+    remaining wall-clock time, judged by the previous epoch's duration.
+    """
+    fetch = fetch or (lambda xb: xb)
+    n = len(X)
+    gen = torch.Generator().manual_seed(seed)
+    X_buf, y_buf = torch.empty_like(X), torch.empty_like(y)
+    n_batches = (n + batch_size - 1) // batch_size
+    history = {"epoch_seconds": [], "loss": [], "val_accuracy": [], "best_epoch": None, "stop_reason": "max_epochs"}
+    best_acc, best_state, stale = -1.0, None, 0
+    started = time.perf_counter()
     for epoch in range(epochs):
-        total_loss = 0
-        for inputs, labels in loader:
-            optimizer.zero_grad()
-            outputs = model(inputs)
-            loss = criterion(outputs, labels)
+        if time_budget is not None and history["epoch_seconds"]:
+            if time.perf_counter() - started + history["epoch_seconds"][-1] > time_budget:
+                history["stop_reason"] = "time_budget"
+                break
+        start = time.perf_counter()
+        model.train()
+        perm = torch.randperm(n, generator=gen)
+        torch.index_select(X, 0, perm, out=X_buf)
+        torch.index_select(y, 0, perm, out=y_buf)
+        total_loss = 0.0
+        for s in range(0, n, batch_size):
+            optimizer.zero_grad(set_to_none=True)
+            loss = criterion(model(fetch(X_buf[s:s + batch_size])), y_buf[s:s + batch_size])
             loss.backward()
             optimizer.step()
             total_loss += loss.item()
-        print(f"Epoch {epoch+1}/{epochs}, Loss: {total_loss/len(loader):.4f}")
-
-
-def evaluate(model, loader):
+        history["loss"].append(total_loss / n_batches)
+        msg = f"Epoch {epoch+1}/{epochs}, Loss: {history['loss'][-1]:.4f}"
+
+        if val is not None:
+            val_acc = float(evaluate_tensors(model, val[0], val[1], fetch=fetch))
+            history["val_accuracy"].append(val_acc)
+            msg += f", Val acc: {val_acc:.4f}"
+            if val_acc > best_acc:
+                best_acc, stale, history["best_epoch"] = val_acc, 0, epoch + 1
+                best_state = {k: v.detach().clone() for k, v in model.state_dict().items()}
+            else:
+                stale += 1
+        history["epoch_seconds"].append(time.perf_counter() - start)
+        print(f"{msg}, Time: {history['epoch_seconds'][-1]:.2f}s")
+        if patience is not None and val is not None and stale >= patience:
+            history["stop_reason"] = "early_stop"
+            break
+
+    if best_state is not None:
+        model.load_state_dict(best_state)
+    return history
+
+
+def evaluate_tensors(model, X, y, batch_size=4096, fetch=None):
+    fetch = fetch or (lambda xb: xb)
     model.eval()
-    preds, labels = [], []
-    with torch.no_grad():
-        for x, y in loader:
-            out = model(x)
-            _, p = torch.max(out, 1)
-            preds.append(p.cpu().numpy())
-            labels.append(y.cpu().numpy())
-    preds = np.concatenate(preds)
-    labels = np.concatenate(labels)
-    return accuracy_score(labels, preds)
+    preds = torch.empty(len(X), dtype=torch.long)
+    with torch.inference_mode():
+        for s in range(0, len(X), batch_size):
+            preds[s:s + batch_size] = model(fetch(X[s:s + batch_size])).argmax(dim=1)
+    return accuracy_score(y.numpy(), preds.numpy())
+
+
+def validation_split(y, val_size, seed):
+    """Indices ``(fit, val)`` holding out about ``val_size`` of ``y``, stratified when possible.
+
+    The held-out part is grown to at least one pixel per class, which stratification
+    needs on small (e.g. sample-budgeted) training splits; if some class has a single
+    pixel the split is plain random. Returns None when too few pixels are left to hold any out.
+    """
+    y = np.asarray(y)
+    counts = np.bincount(y)
+    counts = counts[counts > 0]
+    n_val = max(int(np.ceil(val_size * len(y))), len(counts))
+    if len(y) - n_val < len(counts):
+        return None
+    stratify = y if counts.min() >= 2 else None
+    return train_test_split(np.arange(len(y)), test_size=n_val, random_state=seed, stratify=stratify)
+
+
+def fit_pixel_model(Xtr, ytr, Xte, yte, num_classes, params, in_channels=None, fetch=None):
+    """Trains a fresh model (see ``build_model``); returns ``(model, accuracy, history)``.
+
+    ``Xtr``/``Xte`` are feature tensors, or flat pixel indices when ``fetch`` is given.
+    When ``params`` sets ``patience`` or ``time_budget``, ``val_size`` of the
+    training split is held out for validation (see ``train_model_fast`` and
+    ``validation_split``); with too few pixels for that, training runs without it.
+    """
+    torch.manual_seed(params["seed"])
+    model = build_model(params, in_channels or Xtr.shape[1], num_classes)
+    criterion = nn.CrossEntropyLoss()
+    optimizer = optim.Adam(model.parameters(), lr=params["lr"])
+
+    val = None
+    split = None
+    if (params["patience"] or params["time_budget"]) and params["val_size"]:
+        split = validation_split(ytr.numpy(), params["val_size"], params["seed"])
+    if split is not None:
+        tr, va = map(torch.from_numpy, split)
+        val = (Xtr[va], ytr[va])
+        Xtr, ytr = Xtr[tr], ytr[tr]
+
+    history = train_model_fast(model, Xtr, ytr, criterion, optimizer, epochs=params["epochs"],
+                               batch_size=params["batch_size"], seed=params["seed"], fetch=fetch,
+                               val=val, patience=params["patience"], time_budget=params["time_budget"])
+    history["train_seconds"] = sum(history["epoch_seconds"])
+    return model, evaluate_tensors(model, Xte, yte, fetch=fetch), history
 
 
 # ======================
 # Indices & Visualization
 # ======================
-def compute_ndvi(image, nir_idx, red_idx):
-    nir, red = image[:, :, nir_idx], image[:, :, red_idx]
-    return (nir - red) / (nir + red + 1e-8)
-
-
-def compute_lci(image, nir_idx, green_idx):
-    nir, green = image[:, :, nir_idx], image[:, :, green_idx]
-    return (nir - green) / (nir + green + 1e-8)
+def visualize_overlay(ndvi, lci, prediction_map, out_path, mode=DEFAULT_RENDER_MODE):
+    """Writes the three-panel overlay PNG.
 
-
-def predict_full_image(model, data_image, mask_valid):
-    model.eval()
-    H, W, C = data_image.shape
-    flat = data_image[mask_valid].reshape(-1, C)
-    flat_t = torch.tensor(flat, dtype=torch.float32)
-    with torch.no_grad():
-        p = model(flat_t)
-        p = torch.argmax(p, dim=1).cpu().numpy()
-    full = np.zeros((H * W), dtype=np.uint8)
-    full[mask_valid.flatten()] = p
-    return full.reshape(H, W)
-
-
-def visualize_overlay(ndvi, lci, prediction_map, out_path):
+    ``mode="fast"`` maps the arrays through colormap LUTs and encodes the PNG
+    directly; ``mode="publication"`` draws the titled matplotlib figure.
+    """
     vegetation_mask = (prediction_map == 0) if prediction_map is not None else np.ones_like(ndvi, dtype=bool)
 
     ndvi_veg = np.zeros_like(ndvi)
@@ -117,6 +217,17 @@ def visualize_overlay(ndvi, lci, prediction_map, out_path):
     ndvi_veg[vegetation_mask] = ndvi[vegetation_mask]
     lci_veg[vegetation_mask] = lci[vegetation_mask]
 
+    if mode != "publication":
+        first = (prediction_map, "jet", False) if prediction_map is not None else (ndvi, "YlGn", False)
+        canvas = render_panels([first, (ndvi_veg, "YlGn", True), (lci_veg, "YlOrRd", True)])
+        with open(out_path, "wb") as f:
+            f.write(encode_png(canvas))
+        return
+
+    import matplotlib
+    matplotlib.use("Agg")  # render without display
+    import matplotlib.pyplot as plt
+
     fig, axs = plt.subplots(1, 3, figsize=(16, 5))
     if prediction_map is not None:
         axs[0].imshow(prediction_map, cmap="jet")
@@ -140,64 +251,33 @@ def visualize_overlay(ndvi, lci, prediction_map, out_path):
     plt.close(fig)
 
 
+# analyze_indices verdicts and the severity the deterministic summary reports for each.
+VERDICTS = {
+    "healthy": ("Vegetation healthy: strong biomass and good chlorophyll.", "none"),
+    "nutrient": ("Good structure but low chlorophyll — possible nutrient deficiency.", "moderate"),
+    "sparse": ("Sparse & low chlorophyll — stress, bare soil, or senescence.", "high"),
+    "mixed": ("Mixed vegetation health detected.", "low"),
+}
+
+
 def analyze_indices(ndvi, lci):
     ndvi_mean = float(np.mean(ndvi))
     lci_mean = float(np.mean(lci))
     if ndvi_mean > 0.4 and lci_mean > 0.3:
-        msg = "Vegetation healthy: strong biomass and good chlorophyll."
+        msg = VERDICTS["healthy"][0]
     elif ndvi_mean > 0.4 and lci_mean < 0.2:
-        msg = "Good structure but low chlorophyll — possible nutrient deficiency."
+        msg = VERDICTS["nutrient"][0]
     elif ndvi_mean < 0.3 and lci_mean < 0.2:
-        msg = "Sparse & low chlorophyll — stress, bare soil, or senescence."
+        msg = VERDICTS["sparse"][0]
     else:
-        msg = "Mixed vegetation health detected."
+        msg = VERDICTS["mixed"][0]
     return ndvi_mean, lci_mean, msg
 
 
 # ======================
-# Full Analysis
+# TinyLlama Summary
 # ======================
-def run_hyperspectral_analysis(data_path: str, label_path: str | None, out_dir: str):
-    os.makedirs(out_dir, exist_ok=True)
-
-    data = np.load(data_path)
-    data = (data - data.min()) / (data.max() - data.min() + 1e-12)
-    H, W, C = data.shape
-
-    acc = None
-    pred_map = None
-
-    if label_path:
-        labels = np.load(label_path)
-        X = data.reshape(-1, C)
-        y = labels.reshape(-1)
-        mask = y > 0
-        X, y = X[mask], y[mask] - 1
-        num_classes = int(np.max(y) + 1)
-
-        Xtr, Xte, ytr, yte = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
-        tr_loader = DataLoader(HyperspectralDataset(torch.tensor(Xtr, dtype=torch.float32), torch.tensor(ytr, dtype=torch.long)), batch_size=64, shuffle=True)
-        te_loader = DataLoader(HyperspectralDataset(torch.tensor(Xte, dtype=torch.float32), torch.tensor(yte, dtype=torch.long)), batch_size=64)
-
-        model = PixelCNN(in_channels=C, num_classes=num_classes)
-        criterion = nn.CrossEntropyLoss()
-        optimizer = optim.Adam(model.parameters(), lr=1e-3)
-        train_model(model, tr_loader, criterion, optimizer, epochs=20)
-        acc = evaluate(model, te_loader)
-
-        valid_mask = labels > 0
-        pred_map = predict_full_image(model, data, valid_mask)
-
-    ndvi = compute_ndvi(data, nir_idx=min(48, C-1), red_idx=min(29, C-1))
-    lci = compute_lci(data, nir_idx=min(48, C-1), green_idx=min(19, C-1))
-
-    plot_file = "visualization_output.png"
-    plot_path = os.path.join(out_dir, plot_file)
-    visualize_overlay(ndvi, lci, pred_map, plot_path)
-
-    ndvi_mean, lci_mean, analysis_text = analyze_indices(ndvi, lci)
-
-    # TinyLlama Summary
+def summarize_indices(ndvi_mean, lci_mean, analysis_text, acc):
     prompt = f"""
 You are an agricultural expert. Analyze the following:
 - NDVI mean: {ndvi_mean:.3f}
@@ -209,17 +289,246 @@ Return JSON with:
 problem_detected, severity_level, summary, and recommendations.
 """
 
-    ai_summary = None
     try:
         resp = ollama.chat(model="tinyllama:1.1b", messages=[{"role": "user", "content": prompt.strip()}])
         text = resp["message"]["content"]
         s, e = text.find("{"), text.rfind("}")
         if s != -1 and e != -1:
-            ai_summary = json.loads(text[s:e+1])
-        else:
-            ai_summary = {"summary": text.strip()}
+            return json.loads(text[s:e+1])
+        return {"summary": text.strip()}
     except Exception as e:
-        ai_summary = {"error": f"AI summary failed: {e}"}
+        return {"error": f"AI summary failed: {e}"}
+
+
+def fallback_summary(analysis_text, reason):
+    """Deterministic stand-in for the TinyLlama answer, built from the ``analyze_indices`` verdict."""
+    severity = next((sev for msg, sev in VERDICTS.values() if msg == analysis_text), "unknown")
+    return {
+        "problem_detected": severity not in ("none", "unknown"),
+        "severity_level": severity,
+        "summary": analysis_text,
+        "recommendations": [],
+        "source": "fallback",
+        "fallback_reason": reason,
+    }
+
+
+summaries = SummaryService(summarize_indices)
+
+
+# ======================
+# Full Analysis
+# ======================
+# pca_components: project spectra onto that many principal components before the CNN (None = all bands);
+# compare_full_band also trains on all bands and reports both timings and accuracies in band_reduction.
+# model: "pixel" (PixelCNN on single spectra) or "patch" (PatchCNN on patch_size x patch_size neighbourhoods).
+# sample_budget: train/test on a class-stratified random subset of about that many labeled pixels (None = all).
+# epochs is a cap; patience (epochs without validation gain) and time_budget (seconds) stop training earlier,
+# validating on val_size of the training split and keeping the best epoch's weights.
+TRAIN_PARAMS = {"epochs": 20, "lr": 1e-3, "batch_size": 64, "dropout": 0.5, "test_size": 0.2, "seed": 42,
+                "pca_components": None, "compare_full_band": False, "model": "pixel", "patch_size": 5,
+                "sample_budget": None,
+                "patience": None, "time_budget": None, "val_size": 0.1}
+
+
+def run_hyperspectral_analysis(data_path: str, label_path: str | None, out_dir: str,
+                               predict_batch_size: int = DEFAULT_BATCH_SIZE, predict_workers: int = DEFAULT_WORKERS,
+                               model_cache=None, progress=None, wavelengths=None, extra_indices=(),
+                               train_params=None, render_mode=DEFAULT_RENDER_MODE, artifacts=None,
+                               export_mode=DEFAULT_EXPORT_MODE, summarize=True,
+                               zones=None, zone_names=None, header_path=None, clusters=DEFAULT_CLUSTERS,
+                               digests=None):
+    progress = progress or (lambda stage: None)
+    os.makedirs(out_dir, exist_ok=True)
+
+    progress("load")
+    cube = HyperspectralCube(data_path, header=header_path)
+    H, W, C = cube.shape
+    if wavelengths is None:
+        wavelengths = cube.wavelengths
+    elif len(wavelengths) != C:
+        raise ValueError(f"wavelength table lists {len(wavelengths)} bands, the cube has {C}")
+    # Without a table NDVI / LCI fall back to the pipeline's fixed bands (see BUILTIN_INDICES).
+    engine = IndexEngine(wavelengths, extra=extra_indices, num_bands=C)
+
+    acc = None
+    model = None
+    pred_map = None
+    valid_mask = None
+    inference_stats = None
+    model_cached = False
+    training = None
+    projection = None
+    patches = None
+    band_reduction = None
+    export = None
+    sampling = None
+    clusterer = None
+    clustering = None
+
+    if label_path:
+        labels = np.load(label_path, mmap_mode="r")
+        valid_mask = labels > 0
+        params = {**TRAIN_PARAMS, **(train_params or {})}
+        if params["model"] == "patch":
+            if params["pca_components"]:
+                raise ValueError("pca_components is not supported with the patch model")
+            patches = PatchView(cube, params["patch_size"])
+        key = (cache_key(cube.data_path, label_path, params, cube.header_path, digests)
+               if model_cache is not None else None)
+        cached = model_cache.get(key) if key else None
+
+        if cached is not None:
+            if cached.get("projection") is not None:
+                projection = StreamingPCA.from_state(cached["projection"])
+            in_channels = projection.n_components if projection else C
+            model = build_model(params, in_channels, cached["num_classes"])
+            model.load_state_dict(cached["state_dict"])
+            acc = cached["accuracy"]
+            sampling = cached.get("sampling")
+            band_reduction = cached.get("band_reduction")
+            model_cached = True
+        else:
+            progress("train")
+            if params["pca_components"]:
+                start = time.perf_counter()
+                projection = StreamingPCA(min(int(params["pca_components"]), C)).fit_source(cube)
+                band_reduction = {
+                    "components": projection.n_components,
+                    "explained_variance": projection.explained_variance_ratio,
+                    "fit_seconds": time.perf_counter() - start,
+                }
+
+            train_mask = valid_mask
+            if params["sample_budget"]:
+                sample_idx, sampling = stratified_sample(labels, params["sample_budget"], seed=params["seed"])
+                train_mask = np.zeros(H * W, dtype=bool)
+                train_mask[sample_idx] = True
+                train_mask = train_mask.reshape(H, W)
+
+            # The patch model trains on pixel indices and gathers neighbourhoods per batch.
+            X = np.flatnonzero(train_mask) if patches is not None else cube.take(train_mask)
+            y = labels[train_mask] - 1
+            num_classes = int(np.max(y) + 1)
+
+            Xtr, Xte, ytr, yte = train_test_split(X, y, test_size=params["test_size"], random_state=params["seed"], stratify=y)
+            del X
+            ytr, yte = torch.from_numpy(ytr.astype(np.int64)), torch.from_numpy(yte.astype(np.int64))
+
+            if projection is not None and params["compare_full_band"]:
+                _, full_acc, full_hist = fit_pixel_model(torch.from_numpy(Xtr), ytr, torch.from_numpy(Xte), yte, num_classes, params)
+                band_reduction["full_band"] = {"accuracy": float(full_acc), "train_seconds": full_hist["train_seconds"]}
+            if projection is not None:
+                Xtr, Xte = projection(Xtr), projection(Xte)
+
+            fetch = patches.fetch if patches is not None else None
+            model, acc, training = fit_pixel_model(torch.from_numpy(Xtr), ytr, torch.from_numpy(Xte), yte, num_classes, params,
+                                                   in_channels=C if patches is not None else None, fetch=fetch)
+            if band_reduction is not None:
+                band_reduction.update(accuracy=float(acc), train_seconds=training["train_seconds"])
+            if key:
+                model_cache.put(key, model.state_dict(), accuracy=float(acc), num_classes=num_classes,
+                                projection=projection.state() if projection else None, sampling=sampling,
+                                band_reduction=band_reduction)
+
+    elif clusters:
+        # No labels: segment the scene into spectral clusters instead of classes.
+        progress("train")
+        start = time.perf_counter()
+        clusterer = StreamingKMeans(min(int(clusters), 255), seed=TRAIN_PARAMS["seed"]).fit_source(cube)
+        clustering = {"clusters": clusterer.n_clusters, "fit_seconds": time.perf_counter() - start,
+                      "mini_batches": clusterer.updates}
+
+    progress("predict")
+    # Single streaming pass: each normalized float32 block feeds prediction and indices.
+    indices = engine.allocate(H, W)
+
+    def write_indices(r0, r1, block):
+        engine.update(r0, r1, block, indices)
+
+    if model is not None and export_mode != "none":
+        # Serve predictions from the exported artifact; eager mode stays the fallback.
+        # Its speedup over eager inference is measured by benchmark.py, not per request.
+        exported = model_cache.get_export(key, export_mode) if model_cached else None
+        if exported is None:
+            exported = export_model(model, export_mode)
+            if key:
+                model_cache.put_export(key, export_mode, exported)
+        export = {"mode": export_mode}
+        model = exported
+
+    if model is not None:
+        if patches is not None:
+            # Keep one batch of patches about as large as a batch of plain spectra.
+            predict_batch_size = max(1, predict_batch_size // (patches.patch_size ** 2))
+        predictor = TiledPredictor(model, batch_size=predict_batch_size, workers=predict_workers,
+                                   transform=projection, patches=patches)
+        pred_map, inference_stats = predictor.predict(cube, valid_mask, on_tile=write_indices)
+        print(f"Predicted {inference_stats['pixels']} px at {inference_stats['pixels_per_sec'] or 0:.0f} px/s")
+    elif clusterer is not None:
+        pred_map = np.empty((H, W), dtype=np.uint8)
+        for r0, r1, block in cube.iter_blocks():
+            pred_map[r0:r1] = clusterer.predict(block.reshape(-1, C)).reshape(r1 - r0, W)
+            write_indices(r0, r1, block)
+        pred_map, pixels, means = order_by_index(pred_map, indices["ndvi"], clusterer.n_clusters)
+        valid_mask = np.ones((H, W), dtype=bool)
+        clustering["cluster_pixels"] = pixels.tolist()
+        clustering["cluster_ndvi"] = [float(m) if np.isfinite(m) else None for m in means]
+    else:
+        for r0, r1, block in cube.iter_blocks():
+            write_indices(r0, r1, block)
+
+    ndvi, lci = indices["ndvi"], indices["lci"]
+    # Same convention as uploaded label maps: 0 = unclassified, class k -> k + 1.
+    label_map = class_zones(pred_map, valid_mask).astype(np.uint8) if pred_map is not None else None
+
+    ndvi_mean, lci_mean, analysis_text = analyze_indices(ndvi, lci)
+    # The LLM call runs while the plot and statistics are produced.
+    summary_ticket = summaries.submit(ndvi_mean, lci_mean, analysis_text, acc) if summarize else None
+
+    progress("render")
+    artifact_names = None
+    if artifacts is not None:
+        # Content-addressed outputs: concurrent analyses never share a file name.
+        plot_path = artifacts.temp_path("png")
+        visualize_overlay(ndvi, lci, pred_map, plot_path, mode=render_mode)
+        plot_file = artifacts.put_file(plot_path, "png")
+        artifact_names = {"plot": plot_file, "prediction_map": None, "prediction_rle": None,
+                          "indices": artifacts.put_bytes(encode_npz(**indices), "npz")}
+        if label_map is not None:
+            artifact_names["prediction_map"] = artifacts.put_bytes(encode_npz(labels=label_map), "npz")
+            # Only worth offering when the runs are smaller than the raster itself.
+            rle = rle_encode(label_map, max_bytes=label_map.nbytes)
+            if rle is not None:
+                artifact_names["prediction_rle"] = artifacts.put_bytes(encode_npz(**rle), "npz")
+        # Sources of the zoomable viewer; its tiles are cut from these on first request.
+        layers = {name: (artifacts.put_bytes(encode_npy(values), "npy"), np.nanmin(values), np.nanmax(values))
+                  for name, values in (("ndvi", ndvi), ("lci", lci))}
+        if label_map is not None:
+            layers["classes"] = (artifacts.put_bytes(encode_npy(label_map), "npy"), 0, max(1, int(label_map.max())))
+        artifact_names["tileset"] = artifacts.put_bytes(json.dumps(tileset_spec(H, W, layers)).encode(), "json")
+    else:
+        plot_file = "visualization_output.png"
+        plot_path = os.path.join(out_dir, plot_file)
+        visualize_overlay(ndvi, lci, pred_map, plot_path, mode=render_mode)
+
+    # Per-class / per-zone breakdown instead of one mean over soil and background too.
+    zonal = {"classes": None, "zones": None}
+    if pred_map is not None:
+        zonal["classes"] = zonal_statistics(indices, label_map, names={0: "unclassified"},
+                                            prefix="cluster" if clusterer is not None else "class")
+    if zones is not None:
+        zone_map = np.load(zones, mmap_mode="r") if isinstance(zones, str) else np.asarray(zones)
+        if zone_map.shape != (H, W):
+            raise ValueError(f"zone mask shape {zone_map.shape} does not match the cube ({H}, {W})")
+        zonal["zones"] = zonal_statistics(indices, zone_map, names=zone_names)
+
+    ai_summary = None
+    if summary_ticket is not None:
+        progress("summarize")
+        ai_summary, reason = summaries.wait(summary_ticket)
+        if ai_summary is None:
+            ai_summary = fallback_summary(analysis_text, reason)
 
     return {
         "shape": [H, W, C],
@@ -227,6 +536,17 @@ problem_detected, severity_level, summary, and recommendations.
         "ndvi_mean": ndvi_mean,
         "lci_mean": lci_mean,
         "analysis_text": analysis_text,
+        "indices": {name: float(np.mean(v)) for name, v in indices.items()},
+        "index_bands": engine.bands(),
         "plot_file": plot_file,
+        "artifacts": artifact_names,
+        "inference": inference_stats,
+        "model_cached": model_cached,
+        "training": training,
+        "band_reduction": band_reduction,
+        "export": export,
+        "zonal_stats": zonal,
+        "sampling": sampling,
+        "clustering": clustering,
         "ai_summary": ai_summary
     }
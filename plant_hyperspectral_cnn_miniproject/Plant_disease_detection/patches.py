@@ -0,0 +1,47 @@
+# patches.py
+import numpy as np
+import torch
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+# ======================
+# Zero-copy neighbourhoods
+# ======================
+class PatchView:
+    """k x k spatial neighbourhoods of every pixel, without copying the cube.
+
+    ``sliding_window_view`` over the raw (possibly memory-mapped) array gives
+    a (H-k+1, W-k+1, C, k, k) strided view; only the patches of the pixels
+    asked for are gathered and normalized, one batch at a time. Border pixels
+    use the nearest window that fits inside the image.
+    """
+
+    def __init__(self, source, patch_size=5):
+        self.raw = source.raw if hasattr(source, "raw") else source
+        self._normalize = getattr(source, "normalize", None)
+        self.patch_size = k = int(patch_size)
+        H, W, C = self.raw.shape
+        if k < 1 or k % 2 == 0:
+            raise ValueError(f"patch_size must be a positive odd number, got {k}")
+        if H < k or W < k:
+            raise ValueError(f"patch_size {k} does not fit a {H} x {W} image")
+        self.shape = (H, W, C)
+        self.windows = sliding_window_view(self.raw, (k, k), axis=(0, 1))
+
+    def gather(self, flat_idx):
+        """float32 patches (B x C x k x k) centred on the given flat pixel indices."""
+        H, W, _ = self.shape
+        half = self.patch_size // 2
+        flat_idx = np.asarray(flat_idx, dtype=np.int64)
+        rows = np.clip(flat_idx // W - half, 0, H - self.patch_size)
+        cols = np.clip(flat_idx % W - half, 0, W - self.patch_size)
+        patches = self.windows[rows, cols]
+        if self._normalize is not None:
+            return self._normalize(patches)
+        return np.ascontiguousarray(patches, dtype=np.float32)
+
+    def fetch(self, idx):
+        """``gather`` for a tensor (or array) of flat indices, returned as a float32 tensor."""
+        if isinstance(idx, torch.Tensor):
+            idx = idx.numpy()
+        return torch.from_numpy(self.gather(idx))
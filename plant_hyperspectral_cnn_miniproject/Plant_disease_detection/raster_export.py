@@ -0,0 +1,46 @@
+# raster_export.py
+import io
+
+import numpy as np
+
+
+# ======================
+# Compact raster formats
+# ======================
+def encode_npz(**arrays):
+    """``np.savez_compressed`` into bytes (one named array per raster)."""
+    buf = io.BytesIO()
+    np.savez_compressed(buf, **arrays)
+    return buf.getvalue()
+
+
+def encode_npy(arr):
+    """``np.save`` into bytes, so the array can later be memory-mapped from the store."""
+    buf = io.BytesIO()
+    np.save(buf, np.ascontiguousarray(arr))
+    return buf.getvalue()
+
+
+def rle_encode(arr, max_bytes=None):
+    """Row-major run-length encoding of an integer raster as ``shape`` / ``values`` / ``lengths`` arrays.
+
+    Class maps from labelled fields are mostly long runs of one value, so the
+    runs are typically far smaller than the raster; per-pixel noisy maps are
+    not. With ``max_bytes`` the encoding is abandoned (None) when the runs would
+    take at least that many bytes.
+    """
+    flat = np.asarray(arr).ravel()
+    lengths_dtype = np.min_scalar_type(flat.size)
+    if flat.size == 0:
+        starts = np.empty(0, dtype=np.int64)
+    else:
+        starts = np.r_[0, np.flatnonzero(flat[1:] != flat[:-1]) + 1]
+    if max_bytes is not None and len(starts) * (flat.itemsize + lengths_dtype.itemsize) >= max_bytes:
+        return None
+    lengths = np.diff(np.r_[starts, flat.size]).astype(lengths_dtype)
+    return {"shape": np.array(np.shape(arr), dtype=np.int64), "values": flat[starts], "lengths": lengths}
+
+
+def rle_decode(rle):
+    """Inverse of ``rle_encode``; also accepts the loaded ``.npz``."""
+    return np.repeat(rle["values"], rle["lengths"]).reshape(tuple(rle["shape"]))
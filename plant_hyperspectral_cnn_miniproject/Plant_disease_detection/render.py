@@ -0,0 +1,111 @@
+# render.py
+import os
+import zlib
+import struct
+
+import numpy as np
+
+
+DEFAULT_MODE = os.getenv("PLANT_RENDER_MODE", "fast")
+
+
+# ======================
+# Colormap lookup tables
+# ======================
+def _lut_from_colors(hex_colors, n=256):
+    rgb = np.array([[int(h[i:i + 2], 16) for i in (1, 3, 5)] for h in hex_colors], dtype=np.float64)
+    x = np.linspace(0.0, 1.0, len(rgb))
+    t = np.linspace(0.0, 1.0, n)
+    return np.stack([np.interp(t, x, rgb[:, c]) for c in range(3)], axis=1).round().astype(np.uint8)
+
+
+def _lut_from_segments(segments, n=256):
+    t = np.linspace(0.0, 1.0, n)
+    chans = [np.interp(t, [p for p, _ in seg], [v for _, v in seg]) for seg in segments]
+    return (np.stack(chans, axis=1) * 255).round().astype(np.uint8)
+
+
+# Same anchor points as the matplotlib colormaps the report has always used.
+LUTS = {
+    "YlGn": _lut_from_colors(["#ffffe5", "#f7fcb9", "#d9f0a3", "#addd8e", "#78c679",
+                              "#41ab5d", "#238443", "#006837", "#004529"]),
+    "YlOrRd": _lut_from_colors(["#ffffcc", "#ffeda0", "#fed976", "#feb24c", "#fd8d3c",
+                                "#fc4e2a", "#e31a1c", "#bd0026", "#800026"]),
+    "jet": _lut_from_segments([
+        [(0.0, 0.0), (0.35, 0.0), (0.66, 1.0), (0.89, 1.0), (1.0, 0.5)],
+        [(0.0, 0.0), (0.125, 0.0), (0.375, 1.0), (0.64, 1.0), (0.91, 0.0), (1.0, 0.0)],
+        [(0.0, 0.5), (0.11, 1.0), (0.34, 1.0), (0.65, 0.0), (1.0, 0.0)],
+    ]),
+}
+
+
+def apply_colormap(values, cmap, vmin=None, vmax=None):
+    """Maps a 2-D array to H x W x 3 uint8 through a 256-entry LUT (auto-scaled like ``imshow``)."""
+    lut = LUTS[cmap]
+    values = np.asarray(values, dtype=np.float32)
+    vmin = float(np.nanmin(values)) if vmin is None else vmin
+    vmax = float(np.nanmax(values)) if vmax is None else vmax
+    scale = (len(lut) - 1) / (vmax - vmin) if vmax > vmin else 0.0
+    idx = np.nan_to_num((values - vmin) * scale, nan=0.0)
+    np.clip(idx, 0, len(lut) - 1, out=idx)
+    return lut[idx.astype(np.uint8)]
+
+
+# ======================
+# PNG encoding
+# ======================
+def encode_png(rgb, level=6):
+    """Encodes an H x W x 3 (RGB) or H x W x 4 (RGBA) uint8 array as PNG bytes using only zlib."""
+    rgb = np.ascontiguousarray(rgb, dtype=np.uint8)
+    H, W, channels = rgb.shape
+    raw = np.zeros((H, 1 + W * channels), dtype=np.uint8)  # filter byte 0 per scanline
+    raw[:, 1:] = rgb.reshape(H, W * channels)
+
+    def chunk(tag, data):
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+    header = struct.pack(">IIBBBBB", W, H, 8, 6 if channels == 4 else 2, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header)
+            + chunk(b"IDAT", zlib.compress(raw.tobytes(), level)) + chunk(b"IEND", b""))
+
+
+# ======================
+# Overlay panels
+# ======================
+def _upscale(rgb, min_size, max_size):
+    """Integer nearest-neighbour zoom towards ``min_size`` on the short side, never past ``max_size`` on the long one."""
+    short, long = min(rgb.shape[:2]), max(rgb.shape[:2])
+    factor = max(1, min(min_size // max(1, short), max_size // max(1, long)))
+    if factor == 1:
+        return rgb
+    return np.repeat(np.repeat(rgb, factor, axis=0), factor, axis=1)
+
+
+def _with_colorbar(panel, cmap, height=12, gap=6):
+    W = panel.shape[1]
+    bar = np.broadcast_to(LUTS[cmap][np.linspace(0, 255, W).astype(np.uint8)], (height, W, 3))
+    spacer = np.full((gap, W, 3), 255, dtype=np.uint8)
+    return np.concatenate([panel, spacer, bar], axis=0)
+
+
+def render_panels(panels, min_size=400, max_size=1600, gap=16):
+    """Lays out ``(values, cmap, colorbar)`` panels side by side on a white canvas.
+
+    Small rasters are enlarged by a whole factor so their short side reaches
+    ``min_size``, as long as the long side stays within ``max_size``.
+    """
+    tiles = []
+    for values, cmap, colorbar in panels:
+        tile = _upscale(apply_colormap(values, cmap), min_size, max_size)
+        if colorbar:
+            tile = _with_colorbar(tile, cmap)
+        tiles.append(tile)
+
+    H = max(t.shape[0] for t in tiles) + 2 * gap
+    W = sum(t.shape[1] for t in tiles) + gap * (len(tiles) + 1)
+    canvas = np.full((H, W, 3), 255, dtype=np.uint8)
+    x = gap
+    for t in tiles:
+        canvas[gap:gap + t.shape[0], x:x + t.shape[1]] = t
+        x += t.shape[1] + gap
+    return canvas
@@ -0,0 +1,78 @@
+# sampling.py
+import numpy as np
+
+
+# Pixels of the label map examined per streaming step.
+DEFAULT_CHUNK_PIXELS = 4 * 1024 * 1024
+# Never sample fewer than this per class (stratified splitting needs >= 2).
+MIN_PER_CLASS = 10
+
+
+# ======================
+# Stratified reservoir
+# ======================
+def stratified_sample(labels, budget, seed=42, min_per_class=MIN_PER_CLASS, chunk_pixels=DEFAULT_CHUNK_PIXELS):
+    """Class-stratified random subset of the labeled pixels, in one pass over ``labels``.
+
+    Every labeled pixel (label > 0) gets a random key; per class only the
+    ``budget`` smallest keys seen so far are kept, so memory stays bounded by
+    ``budget x classes`` however large the map is. At the end each class keeps
+    its share of the budget in proportion to its frequency (at least
+    ``min_per_class``, or all its pixels if it has fewer) -- a uniform random
+    sample within every class.
+
+    Returns ``(flat_idx, report)``: sorted flat pixel indices and per-class
+    labeled / sampled counts.
+    """
+    flat = np.asarray(labels).reshape(-1)  # still a lazy view for memory-mapped labels
+    budget = int(budget)
+    rng = np.random.default_rng(seed)
+
+    keep_idx = np.empty(0, dtype=np.int64)
+    keep_cls = np.empty(0, dtype=np.int64)
+    keep_key = np.empty(0, dtype=np.float64)
+    counts = np.zeros(1, dtype=np.int64)
+    for start in range(0, flat.size, chunk_pixels):
+        chunk = np.asarray(flat[start:start + chunk_pixels])
+        pos = np.flatnonzero(chunk > 0)
+        if not pos.size:
+            continue
+        cls = chunk[pos].astype(np.int64)
+        seen = np.bincount(cls)
+        if seen.size > counts.size:
+            counts = np.pad(counts, (0, seen.size - counts.size))
+        counts[:seen.size] += seen
+
+        keep_idx = np.concatenate((keep_idx, pos + start))
+        keep_cls = np.concatenate((keep_cls, cls))
+        keep_key = np.concatenate((keep_key, rng.random(pos.size)))
+        keep = _smallest_per_class(keep_cls, keep_key, budget)
+        keep_idx, keep_cls, keep_key = keep_idx[keep], keep_cls[keep], keep_key[keep]
+
+    total = int(counts.sum())
+    quota = np.minimum(counts, np.maximum(min_per_class, np.round(budget * counts / max(total, 1)).astype(np.int64)))
+    keep = _smallest_per_class(keep_cls, keep_key, quota)
+    flat_idx = np.sort(keep_idx[keep])
+    sampled = np.bincount(keep_cls[keep], minlength=counts.size)
+
+    report = {
+        "budget": budget,
+        "labeled_pixels": total,
+        "sampled_pixels": int(flat_idx.size),
+        "per_class": {int(c): {"labeled": int(counts[c]), "sampled": int(sampled[c])}
+                      for c in np.flatnonzero(counts)},
+    }
+    return flat_idx, report
+
+
+def _smallest_per_class(cls, key, limit):
+    """Mask of the entries whose key ranks below ``limit`` (scalar or per class) within their class."""
+    order = np.lexsort((key, cls))
+    sorted_cls = cls[order]
+    starts = np.flatnonzero(np.r_[True, sorted_cls[1:] != sorted_cls[:-1]])
+    sizes = np.diff(np.r_[starts, sorted_cls.size])
+    rank = np.arange(sorted_cls.size) - np.repeat(starts, sizes)
+    cap = limit if np.isscalar(limit) else np.asarray(limit)[sorted_cls]
+    mask = np.zeros(cls.size, dtype=bool)
+    mask[order[rank < cap]] = True
+    return mask
@@ -0,0 +1,151 @@
+# spectral_indices.py
+import re
+
+import numpy as np
+
+
+EPS = np.float32(1e-8)
+
+
+class BandLookupError(ValueError):
+    pass
+
+
+def parse_wavelengths(text):
+    """Band centres in nm from a wavelength table (one value per band).
+
+    Values may be separated by commas, semicolons, whitespace or newlines; a
+    non-numeric first line (a CSV header) is skipped. As in ENVI headers, a
+    table whose values are all below 100 is taken to be in micrometres.
+    Raises ValueError when the table is empty or not numeric.
+    """
+    lines = text.strip().splitlines()
+    if lines and not re.match(r"^\s*[-+.\d]", lines[0]):
+        lines = lines[1:]
+    tokens = [t for t in re.split(r"[\s,;]+", "\n".join(lines)) if t]
+    try:
+        wl = np.array([float(t) for t in tokens], dtype=np.float64)
+    except ValueError:
+        raise ValueError("wavelength table must list one number per band") from None
+    if not len(wl):
+        raise ValueError("wavelength table is empty")
+    if wl.max() < 100:
+        wl = wl * 1000.0
+    return wl
+
+
+def normalized_difference(a, b, out):
+    np.subtract(a, b, out=out)
+    den = a + b
+    den += EPS
+    np.divide(out, den, out=out)
+    return out
+
+
+class SpectralIndex:
+    """An index computed from the reflectance at a few wavelengths.
+
+    ``formula`` receives the bands (float32, in ``wavelengths`` order) followed
+    by a preallocated ``out`` array; it defaults to a normalized difference of
+    the first two bands. ``default_bands`` are the band numbers used when the
+    cube carries no wavelength table (None: the index then needs one).
+    """
+
+    def __init__(self, name, wavelengths, formula=normalized_difference, default_bands=None):
+        self.name = name
+        self.wavelengths = tuple(float(w) for w in wavelengths)
+        self.formula = formula
+        self.default_bands = tuple(int(b) for b in default_bands) if default_bands is not None else None
+
+
+BUILTIN_INDICES = {
+    # Without a wavelength table NDVI and LCI keep the bands the pipeline has always
+    # used (NIR 48, red 29, green 19; clamped to the last band of smaller cubes).
+    "ndvi": SpectralIndex("ndvi", (860, 680), default_bands=(48, 29)),
+    # Same NIR / green pair the pipeline has always reported as LCI.
+    "lci": SpectralIndex("lci", (860, 580), default_bands=(48, 19)),
+    "gndvi": SpectralIndex("gndvi", (860, 550)),
+    "ndre": SpectralIndex("ndre", (790, 720)),
+    "pri": SpectralIndex("pri", (531, 570)),
+}
+
+
+# ======================
+# Fused index engine
+# ======================
+class IndexEngine:
+    """Computes many spectral indices in one pass over a cube.
+
+    Bands are resolved once against the wavelength table; every chunk then
+    gathers the distinct bands it needs with a single fancy index and writes
+    each index straight into preallocated float32 maps, so an extra index
+    costs a couple of vector ops per chunk rather than another pass over the
+    cube.
+
+    With ``wavelengths=None`` (a cube without a wavelength table) indices use
+    their ``default_bands`` on a ``num_bands`` cube; built-in indices without
+    default bands are left out, extra ones raise ``BandLookupError``. So does
+    an index whose wavelengths resolve to the same band, which would make it
+    identically zero.
+    """
+
+    def __init__(self, wavelengths, indices=tuple(BUILTIN_INDICES), extra=(), num_bands=None):
+        self.wavelengths = None if wavelengths is None else np.asarray(wavelengths, dtype=np.float64)
+        self.num_bands = len(self.wavelengths) if self.wavelengths is not None else num_bands
+        if self.num_bands is None:
+            raise ValueError("num_bands is required without a wavelength table")
+        specs = [BUILTIN_INDICES[name] if isinstance(name, str) else name for name in indices]
+        if self.wavelengths is None:
+            specs = [spec for spec in specs if spec.default_bands is not None]
+        self.specs = specs + list(extra)
+
+        self._bands = {spec.name: self._resolve(spec) for spec in self.specs}
+        needed = sorted({b for bands in self._bands.values() for b in bands})
+        self.band_idx = np.asarray(needed, dtype=np.intp)
+        slot = {b: i for i, b in enumerate(needed)}
+        self._slots = [[slot[b] for b in self._bands[spec.name]] for spec in self.specs]
+
+    def band_for(self, nm):
+        wl = self.wavelengths
+        if wl is None:
+            raise BandLookupError(f"no wavelength table to look up {nm:g} nm in")
+        spacing = float(np.max(np.diff(wl))) if len(wl) > 1 else 0.0
+        if nm < wl.min() - spacing or nm > wl.max() + spacing:
+            raise BandLookupError(f"{nm:g} nm is outside the sensor range {wl.min():g}-{wl.max():g} nm")
+        return int(np.argmin(np.abs(wl - nm)))
+
+    def _resolve(self, spec):
+        if self.wavelengths is not None:
+            bands = [self.band_for(w) for w in spec.wavelengths]
+        elif spec.default_bands is not None:
+            bands = [min(b, self.num_bands - 1) for b in spec.default_bands]
+        else:
+            raise BandLookupError(f"{spec.name} needs a wavelength table")
+        if len(set(bands)) < len(bands):
+            waves = " / ".join(f"{w:g}" for w in spec.wavelengths)
+            raise BandLookupError(f"{spec.name}: {waves} nm resolve to bands {bands}; "
+                                  f"the sensor cannot tell them apart")
+        return bands
+
+    def bands(self):
+        return {name: list(bands) for name, bands in self._bands.items()}
+
+    def allocate(self, H, W):
+        return {spec.name: np.empty((H, W), dtype=np.float32) for spec in self.specs}
+
+    def update(self, r0, r1, block, out):
+        """Writes the indices of rows ``r0:r1`` (normalized ``block``) into ``out``."""
+        picked = np.asarray(block[:, :, self.band_idx], dtype=np.float32)
+        for spec, slots in zip(self.specs, self._slots):
+            spec.formula(*(picked[:, :, s] for s in slots), out=out[spec.name][r0:r1])
+
+    def compute(self, source):
+        """Indices of a whole in-memory array or ``HyperspectralCube``, streamed chunk by chunk."""
+        H, W = source.shape[:2]
+        out = self.allocate(H, W)
+        if hasattr(source, "iter_blocks"):
+            for r0, r1, block in source.iter_blocks():
+                self.update(r0, r1, block, out)
+        else:
+            self.update(0, H, source, out)
+        return out
@@ -0,0 +1,94 @@
+# summaries.py
+import os
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+
+
+DEFAULT_TIMEOUT = float(os.getenv("PLANT_SUMMARY_TIMEOUT", 15))
+DEFAULT_CACHE_SIZE = int(os.getenv("PLANT_SUMMARY_CACHE", 256))
+# Inputs are rounded to this step before keying (and prompting), so near-identical scenes share a summary.
+DEFAULT_QUANTUM = float(os.getenv("PLANT_SUMMARY_QUANTUM", 0.01))
+
+
+# ======================
+# Cached, time-boxed LLM calls
+# ======================
+class SummaryService:
+    """Runs ``summarize(ndvi_mean, lci_mean, analysis_text, acc)`` off the request thread.
+
+    Results are cached (LRU) on the quantized inputs, and concurrent requests
+    for the same key share one in-flight call. ``submit`` returns immediately
+    so the caller can keep working (e.g. rendering); ``wait`` gives the call
+    whatever is left of ``timeout`` and otherwise reports why it has no answer. A call that
+    finishes after its caller gave up still fills the cache for the next one.
+    Results carrying an ``"error"`` key are not cached.
+    """
+
+    def __init__(self, summarize, timeout=DEFAULT_TIMEOUT, cache_size=DEFAULT_CACHE_SIZE,
+                 quantum=DEFAULT_QUANTUM, workers=2):
+        self.summarize = summarize
+        self.timeout = float(timeout)
+        self.cache_size = int(cache_size)
+        self.quantum = float(quantum)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="summary")
+        self._lock = threading.RLock()  # add_done_callback may run _store inline under submit's lock
+        self._cache = OrderedDict()
+        self._inflight = {}
+        self.stats = {"hits": 0, "misses": 0, "joined": 0, "timeouts": 0, "errors": 0}
+
+    def _q(self, value):
+        return None if value is None else round(round(float(value) / self.quantum) * self.quantum, 6)
+
+    def key(self, ndvi_mean, lci_mean, analysis_text, acc):
+        return (self._q(ndvi_mean), self._q(lci_mean), self._q(acc), analysis_text)
+
+    def submit(self, ndvi_mean, lci_mean, analysis_text, acc):
+        """Starts (or joins, or answers from cache) the summary; returns a ticket for ``wait``."""
+        key = self.key(ndvi_mean, lci_mean, analysis_text, acc)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.stats["hits"] += 1
+                future = Future()
+                future.set_result(self._cache[key])
+                return {"future": future, "deadline": time.monotonic(), "source": "cache"}
+            future = self._inflight.get(key)
+            if future is None:
+                self.stats["misses"] += 1
+                future = self._pool.submit(self.summarize, key[0], key[1], analysis_text, key[2])
+                self._inflight[key] = future
+                future.add_done_callback(lambda f, key=key: self._store(key, f))
+            else:
+                self.stats["joined"] += 1
+        return {"future": future, "deadline": time.monotonic() + self.timeout, "source": "model"}
+
+    def wait(self, ticket):
+        """``(summary, None)``, or ``(None, reason)`` when the call failed or missed the deadline."""
+        try:
+            result = ticket["future"].result(timeout=max(0.0, ticket["deadline"] - time.monotonic()))
+        except TimeoutError:
+            with self._lock:
+                self.stats["timeouts"] += 1
+            return None, f"no answer within {self.timeout:g}s"
+        except Exception as e:
+            result = {"error": f"AI summary failed: {e}"}
+        if not isinstance(result, dict) or result.get("error"):
+            with self._lock:
+                self.stats["errors"] += 1
+            return None, result.get("error") if isinstance(result, dict) else "unexpected model output"
+        return {**result, "source": ticket["source"]}, None
+
+    def _store(self, key, future):
+        with self._lock:
+            self._inflight.pop(key, None)
+            if future.exception() is not None:
+                return
+            result = future.result()
+            if not isinstance(result, dict) or result.get("error"):
+                return
+            self._cache[key] = result
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
@@ -0,0 +1,231 @@
+# sweep.py
+"""Parallel hyperparameter sweep for the pixel classifier.
+
+    python -m plant_hyperspectral_cnn_miniproject.Plant_disease_detection.sweep \
+        cube.npy labels.npy --grid lr=1e-3,3e-3 batch_size=64,256 dropout=0.3,0.5 \
+        --workers 4 --model-cache model_cache/ --out leaderboard.json
+
+The labeled pixels are split once into train / validation / test and written
+to a scratch directory; every worker loads them once at start-up, so the data
+is not pickled through the pool with each candidate. Candidates are ranked on validation accuracy and the
+winner is stored in the model cache under the same key
+``run_hyperspectral_analysis`` computes for those parameters, so a later
+analysis with ``train_params=best["params"]`` reuses it without retraining.
+"""
+import os
+import io
+import sys
+import csv
+import json
+import time
+import argparse
+import itertools
+import tempfile
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+
+DEFAULT_GRID = {"lr": [1e-3, 3e-3], "batch_size": [64, 256], "dropout": [0.3, 0.5]}
+SPLITS = ("Xfit", "yfit", "Xval", "yval", "Xte", "yte")
+LEADERBOARD_FIELDS = ("rank", "params", "val_accuracy", "test_accuracy", "best_epoch", "epochs_run",
+                      "stop_reason", "train_seconds")
+
+_data = None  # per-worker tensors, set by init_worker
+
+
+def expand_grid(grid):
+    """Every combination of a ``{param: [values]}`` grid, as a list of dicts."""
+    keys = sorted(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def parse_grid(items):
+    """``["lr=1e-3,3e-3", "epochs=10"]`` -> ``{"lr": [0.001, 0.003], "epochs": [10]}``."""
+    grid = {}
+    for item in items:
+        name, _, values = item.partition("=")
+        if not values:
+            raise ValueError(f"grid entries look like name=v1,v2, got {item!r}")
+        grid[name.strip()] = [json.loads(v) for v in values.split(",")]
+    return grid
+
+
+# ======================
+# Data preparation
+# ======================
+def prepare_splits(data_path, label_path, params, scratch, header_path=None):
+    """Writes the train / validation / test split of the labeled pixels to ``scratch``.
+
+    Follows the split ``run_hyperspectral_analysis`` uses (same sampling and
+    ``test_size``), then holds out ``val_size`` of the training part.
+    """
+    from sklearn.model_selection import train_test_split
+    from .cube_loader import HyperspectralCube
+    from .sampling import stratified_sample
+    from .model_hyperspectral import validation_split
+
+    cube = HyperspectralCube(data_path, header=header_path)
+    labels = np.load(label_path, mmap_mode="r")
+    mask = labels > 0
+    if params["sample_budget"]:
+        idx, _ = stratified_sample(labels, params["sample_budget"], seed=params["seed"])
+        mask = np.zeros(labels.size, dtype=bool)
+        mask[idx] = True
+        mask = mask.reshape(labels.shape)
+    X = cube.take(mask)
+    y = (labels[mask] - 1).astype(np.int64)
+
+    Xtr, Xte, ytr, yte = train_test_split(X, y, test_size=params["test_size"], random_state=params["seed"], stratify=y)
+    split = validation_split(ytr, params["val_size"] or 0.1, params["seed"])
+    if split is None:
+        raise ValueError(f"{len(ytr)} training pixels are too few to hold out a validation set")
+    Xfit, Xval, yfit, yval = Xtr[split[0]], Xtr[split[1]], ytr[split[0]], ytr[split[1]]
+    arrays = dict(zip(SPLITS, (Xfit, yfit, Xval, yval, Xte, yte)))
+    for name, arr in arrays.items():
+        np.save(os.path.join(scratch, f"{name}.npy"), arr)
+    return {"in_channels": X.shape[1], "num_classes": int(y.max() + 1),
+            "fit": len(yfit), "val": len(yval), "test": len(yte),
+            "data_path": cube.data_path, "header_path": cube.header_path}
+
+
+# ======================
+# Workers
+# ======================
+def init_worker(torch_threads, scratch):
+    from .batch_cli import init_worker as limit_threads
+    import torch
+
+    global _data
+    limit_threads(torch_threads)
+    _data = {name: torch.from_numpy(np.load(os.path.join(scratch, f"{name}.npy"))) for name in SPLITS}
+
+
+def train_candidate(params, num_classes):
+    """Trains one configuration on the shared split; returns its metrics and weights."""
+    import torch
+    import torch.nn as nn
+    import torch.optim as optim
+    from .model_hyperspectral import build_model, train_model_fast, evaluate_tensors
+
+    d = _data
+    torch.manual_seed(params["seed"])
+    model = build_model(params, d["Xfit"].shape[1], num_classes)
+    optimizer = optim.Adam(model.parameters(), lr=params["lr"])
+    with contextlib.redirect_stdout(io.StringIO()):  # keep per-epoch lines of parallel runs out of the log
+        history = train_model_fast(model, d["Xfit"], d["yfit"], nn.CrossEntropyLoss(), optimizer,
+                                   epochs=params["epochs"], batch_size=params["batch_size"], seed=params["seed"],
+                                   val=(d["Xval"], d["yval"]), patience=params["patience"],
+                                   time_budget=params["time_budget"])
+    best = history["best_epoch"]
+    return {
+        "params": params,
+        "val_accuracy": history["val_accuracy"][best - 1] if best else None,
+        "test_accuracy": float(evaluate_tensors(model, d["Xte"], d["yte"])),
+        "best_epoch": best,
+        "epochs_run": len(history["epoch_seconds"]),
+        "stop_reason": history["stop_reason"],
+        "train_seconds": sum(history["epoch_seconds"]),
+        "state_dict": {k: v.detach().cpu() for k, v in model.state_dict().items()},
+    }
+
+
+# ======================
+# Driver
+# ======================
+def run_sweep(data_path, label_path, grid=None, base_params=None, workers=2, torch_threads=None,
+              model_cache=None, header_path=None):
+    """Trains every grid configuration in a process pool; returns ``{"best", "leaderboard", "data"}``."""
+    from .model_hyperspectral import TRAIN_PARAMS
+    from .model_cache import cache_key
+
+    grid = grid or DEFAULT_GRID
+    base = {**TRAIN_PARAMS, **(base_params or {})}
+    if base["model"] != "pixel" or base["pca_components"]:
+        raise ValueError("the sweep covers the pixel model on full spectra only")
+    candidates = [{**base, **combo} for combo in expand_grid(grid)]
+    torch_threads = torch_threads or max(1, (os.cpu_count() or 1) // workers)
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="plant_sweep_") as scratch:
+        data = prepare_splits(data_path, label_path, base, scratch, header_path)
+        print(f"{len(candidates)} candidates on {workers} workers x {torch_threads} threads "
+              f"({data['fit']} fit / {data['val']} val / {data['test']} test pixels)")
+        ctx = multiprocessing.get_context("spawn")  # fresh interpreters: no forked OpenMP state
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=init_worker,
+                                 initargs=(torch_threads, scratch)) as pool:
+            futures = [pool.submit(train_candidate, p, data["num_classes"]) for p in candidates]
+            for fut in as_completed(futures):
+                r = fut.result()
+                results.append(r)
+                print(f"  val={r['val_accuracy']:.4f} test={r['test_accuracy']:.4f} "
+                      f"{r['train_seconds']:.1f}s {swept(r['params'], grid)}")
+
+    results.sort(key=lambda r: (-(r["val_accuracy"] or 0.0), r["train_seconds"]))
+    leaderboard = [{**{k: r.get(k) for k in LEADERBOARD_FIELDS}, "rank": rank, "params": swept(r["params"], grid)}
+                   for rank, r in enumerate(results, 1)]
+    best = results[0]
+
+    key = None
+    if model_cache is not None:
+        key = cache_key(data["data_path"], label_path, best["params"], data["header_path"])
+        model_cache.put(key, best["state_dict"], accuracy=best["test_accuracy"], num_classes=data["num_classes"],
+                        projection=None, sampling=None, sweep=leaderboard)
+    return {
+        "best": {**{k: v for k, v in best.items() if k != "state_dict"}, "cache_key": key},
+        "leaderboard": leaderboard,
+        "data": data,
+    }
+
+
+def swept(params, grid):
+    return {k: params[k] for k in sorted(grid)}
+
+
+def write_leaderboard(path, report):
+    if path.endswith(".csv"):
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=LEADERBOARD_FIELDS)
+            writer.writeheader()
+            for row in report["leaderboard"]:
+                writer.writerow({**row, "params": json.dumps(row["params"])})
+    else:
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("cube", help=".npy cube or ENVI .hdr")
+    ap.add_argument("labels", help=".npy label map")
+    ap.add_argument("--grid", nargs="*", default=[], help="name=v1,v2 entries (default: lr x batch_size x dropout)")
+    ap.add_argument("--epochs", type=int, default=20, help="epoch cap for every candidate")
+    ap.add_argument("--patience", type=int, default=5, help="early-stop patience on validation accuracy")
+    ap.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    ap.add_argument("--torch-threads", type=int, help="intra-op threads per worker (default: cores / workers)")
+    ap.add_argument("--model-cache", help="model cache directory that receives the best model")
+    ap.add_argument("--out", default="sweep_leaderboard.json", help=".json report or .csv leaderboard")
+    args = ap.parse_args(argv)
+
+    from .model_cache import ModelCache
+    grid = parse_grid(args.grid) if args.grid else None
+    start = time.perf_counter()
+    report = run_sweep(args.cube, args.labels, grid=grid, base_params={"epochs": args.epochs, "patience": args.patience},
+                       workers=args.workers, torch_threads=args.torch_threads,
+                       model_cache=ModelCache(args.model_cache) if args.model_cache else None)
+    write_leaderboard(args.out, report)
+
+    print(f"\n{'rank':>4}  {'val':>6}  {'test':>6}  {'epochs':>6}  {'seconds':>7}  params")
+    for row in report["leaderboard"]:
+        print(f"{row['rank']:>4}  {row['val_accuracy']:.4f}  {row['test_accuracy']:.4f}  {row['epochs_run']:>6}  "
+              f"{row['train_seconds']:>7.1f}  {json.dumps(row['params'])}")
+    print(f"Sweep took {time.perf_counter() - start:.1f}s; wrote {args.out}")
+    if report["best"]["cache_key"]:
+        print(f"Best model cached as {report['best']['cache_key']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+# tiles.py
+import os
+import json
+import math
+import shutil
+import threading
+
+import numpy as np
+
+from .render import apply_colormap, encode_png
+
+
+TILE_SIZE = 256
+DEFAULT_MAX_BYTES = int(os.getenv("PLANT_TILE_MB", 512)) * 1024 * 1024
+# Rows of the finer level read per step while building a coarser one.
+BUILD_ROWS = 1024
+
+# How each layer is coloured and downsampled.
+LAYER_STYLES = {
+    "classes": {"cmap": "jet", "resample": "nearest", "transparent": 0},
+    "ndvi": {"cmap": "YlGn", "resample": "mean", "transparent": None},
+    "lci": {"cmap": "YlOrRd", "resample": "mean", "transparent": None},
+}
+
+
+def max_zoom_for(H, W, tile_size=TILE_SIZE):
+    """Zoom level at which one tile pixel is one image pixel (zoom 0 fits the image in one tile)."""
+    return math.ceil(math.log2(max(H, W) / tile_size)) if max(H, W) > tile_size else 0
+
+
+def tileset_spec(H, W, layers, tile_size=TILE_SIZE):
+    """JSON-ready description of a pyramid; ``layers`` maps name -> (artifact name, vmin, vmax)."""
+    return {
+        "width": int(W),
+        "height": int(H),
+        "tile_size": tile_size,
+        "max_zoom": max_zoom_for(H, W, tile_size),
+        "layers": {name: {"source": source, "vmin": float(vmin), "vmax": float(vmax), **LAYER_STYLES[name]}
+                   for name, (source, vmin, vmax) in layers.items()},
+    }
+
+
+# ======================
+# Downsampling
+# ======================
+def _halve(src, out, resample):
+    """Writes the 2x-downsampled ``src`` into ``out`` a few rows at a time."""
+    h, w = src.shape
+    for r0 in range(0, h, BUILD_ROWS):
+        block = np.asarray(src[r0:r0 + BUILD_ROWS])
+        o0 = r0 // 2
+        if resample == "nearest":
+            out[o0:o0 + (block.shape[0] + 1) // 2] = block[::2, ::2]
+            continue
+        bh, bw = block.shape
+        padded = np.full((bh + bh % 2, bw + bw % 2), np.nan, dtype=np.float32)
+        padded[:bh, :bw] = block
+        quads = padded.reshape(padded.shape[0] // 2, 2, padded.shape[1] // 2, 2)
+        valid = ~np.isnan(quads)
+        total = np.where(valid, quads, 0.0).sum(axis=(1, 3))
+        count = valid.sum(axis=(1, 3))
+        out[o0:o0 + quads.shape[0]] = np.where(count > 0, total / np.maximum(count, 1), np.nan)
+
+
+# ======================
+# Lazy pyramid
+# ======================
+class TilePyramid:
+    """XYZ tiles of one raster layer, built on first request and kept on disk.
+
+    Level ``max_zoom`` is the source raster itself (memory-mapped); every
+    coarser level is the previous one halved (block mean for continuous
+    indices, nearest for class maps) and saved as ``level_<z>.npy``, so a
+    level is computed once and each tile only slices a small window of it.
+    Rendered tiles are cached as ``<z>/<x>/<y>.png``.
+    """
+
+    def __init__(self, source_path, cache_dir, layer, max_zoom, tile_size=TILE_SIZE):
+        self.source_path = source_path
+        self.cache_dir = cache_dir
+        self.layer = layer
+        self.max_zoom = int(max_zoom)
+        self.tile_size = int(tile_size)
+        self._lock = threading.RLock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def level(self, z):
+        if z == self.max_zoom:
+            return np.load(self.source_path, mmap_mode="r")
+        path = os.path.join(self.cache_dir, f"level_{z}.npy")
+        if not os.path.exists(path):
+            with self._lock:  # re-entrant: building level z first builds z + 1
+                if not os.path.exists(path):
+                    finer = self.level(z + 1)
+                    dtype = finer.dtype if self.layer["resample"] == "nearest" else np.float32
+                    tmp = f"{path}.tmp.npy"
+                    out = np.lib.format.open_memmap(tmp, mode="w+", dtype=dtype,
+                                                    shape=((finer.shape[0] + 1) // 2, (finer.shape[1] + 1) // 2))
+                    _halve(finer, out, self.layer["resample"])
+                    out.flush()
+                    del out
+                    os.replace(tmp, path)
+        return np.load(path, mmap_mode="r")
+
+    def tile_path(self, z, x, y):
+        return os.path.join(self.cache_dir, str(z), str(x), f"{y}.png")
+
+    def tile(self, z, x, y):
+        """Path of the PNG for tile (z, x, y), rendering it if needed; None outside the image."""
+        if not 0 <= z <= self.max_zoom or x < 0 or y < 0:
+            return None
+        path = self.tile_path(z, x, y)
+        if os.path.exists(path):
+            return path
+        data = self.level(z)
+        T = self.tile_size
+        window = np.asarray(data[y * T:(y + 1) * T, x * T:(x + 1) * T])
+        if window.size == 0:
+            return None
+
+        style = self.layer
+        h, w = window.shape
+        rgba = np.zeros((T, T, 4), dtype=np.uint8)  # transparent beyond the image edge
+        rgba[:h, :w, :3] = apply_colormap(window, style["cmap"], style["vmin"], style["vmax"])
+        opaque = ~np.isnan(window) if window.dtype.kind == "f" else np.ones(window.shape, dtype=bool)
+        if style.get("transparent") is not None:
+            opaque &= window != style["transparent"]
+        rgba[:h, :w, 3] = np.where(opaque, 255, 0)
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(encode_png(rgba))
+        os.replace(tmp, path)
+        return path
+
+
+class TileCache:
+    """One ``TilePyramid`` directory per (tileset, layer) under ``root``, evicted LRU by mtime."""
+
+    def __init__(self, root, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = int(max_bytes)
+        self._lock = threading.Lock()
+        self._pyramids = {}
+        self._writes = 0
+        os.makedirs(root, exist_ok=True)
+
+    def pyramid(self, tileset_name, layer_name, spec, source_path):
+        key = (tileset_name, layer_name)
+        with self._lock:
+            pyr = self._pyramids.get(key)
+            if pyr is None:
+                cache_dir = os.path.join(self.root, tileset_name.split(".", 1)[0], layer_name)
+                pyr = TilePyramid(source_path, cache_dir, spec["layers"][layer_name], spec["max_zoom"],
+                                  spec["tile_size"])
+                self._pyramids[key] = pyr
+        return pyr
+
+    def tile(self, tileset_name, layer_name, spec, source_path, z, x, y):
+        pyr = self.pyramid(tileset_name, layer_name, spec, source_path)
+        existed = os.path.exists(pyr.tile_path(z, x, y))
+        path = pyr.tile(z, x, y)
+        if path is not None:
+            os.utime(pyr.cache_dir)
+            if not existed:
+                with self._lock:
+                    self._writes += 1
+                    check = self._writes % 64 == 0
+                if check:
+                    self.evict(keep=pyr.cache_dir)
+        return path
+
+    def evict(self, keep=None):
+        entries = []
+        for tileset in os.listdir(self.root):
+            for layer in os.listdir(os.path.join(self.root, tileset)):
+                d = os.path.join(self.root, tileset, layer)
+                size = sum(os.path.getsize(os.path.join(dp, f)) for dp, _, fs in os.walk(d) for f in fs)
+                entries.append((os.path.getmtime(d), size, d))
+        total = sum(size for _, size, _ in entries)
+        for _, size, d in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if d == keep:
+                continue
+            with self._lock:
+                self._pyramids = {k: p for k, p in self._pyramids.items() if p.cache_dir != d}
+            shutil.rmtree(d, ignore_errors=True)
+            total -= size
+
+
+def load_spec(path):
+    with open(path) as f:
+        return json.load(f)
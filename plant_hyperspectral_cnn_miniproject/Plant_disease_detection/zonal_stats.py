@@ -0,0 +1,89 @@
+# zonal_stats.py
+import numpy as np
+
+
+DEFAULT_PERCENTILES = (10, 25, 50, 75, 90)
+
+
+def class_zones(pred_map, mask_valid):
+    """Zone ids from a prediction map: the original label id (class + 1) for
+    predicted pixels, 0 for pixels that were never classified."""
+    zones = pred_map.astype(np.int64) + 1
+    zones[~np.asarray(mask_valid, dtype=bool)] = 0
+    return zones
+
+
+# ======================
+# Grouped reductions
+# ======================
+def grouped_quantiles(values, groups, counts, q):
+    """Linear-interpolated quantiles ``q`` (0..1) of ``values`` within each group.
+
+    ``groups`` holds dense ids 0..G-1 and ``counts`` the (non-zero) size of
+    each. One lexsort orders the pixels by (group, value); the quantile
+    positions of every group are then read from that single sorted array.
+    """
+    ordered = values[np.lexsort((values, groups))]
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[:, None]
+    pos = (counts[:, None] - 1) * np.asarray(q, dtype=np.float64)[None, :]
+    lo = np.floor(pos).astype(np.int64)
+    hi = np.minimum(lo + 1, counts[:, None] - 1)
+    frac = pos - lo
+    return ordered[starts + lo] * (1 - frac) + ordered[starts + hi] * frac
+
+
+def zonal_statistics(indices, zones, names=None, prefix="zone", percentiles=DEFAULT_PERCENTILES):
+    """Per-zone pixel count and mean / std / min / max / percentiles of every index map.
+
+    ``zones`` is an (H, W) map of non-negative integer ids (predicted classes or
+    a user zone mask). Counts, sums and squared sums come from ``np.bincount``,
+    so each statistic is one vectorized reduction over the image rather than a
+    loop over zones. Non-finite index values are left out of that index's
+    statistics. ``names`` maps zone ids to labels; others become ``<prefix>_<id>``.
+    Returns a list of per-zone dicts ordered by zone id.
+    """
+    zones = np.asarray(zones).ravel()
+    if zones.size == 0:
+        return []
+    if zones.min() < 0:
+        raise ValueError("zone ids must be non-negative")
+    zones = zones.astype(np.int64, copy=False)
+    names = names or {}
+
+    pixels = np.bincount(zones)
+    present = np.flatnonzero(pixels)
+    table = [{"zone": int(z), "name": names.get(int(z), f"{prefix}_{int(z)}"), "pixels": int(pixels[z]),
+              "fraction": float(pixels[z] / zones.size), "indices": {}} for z in present]
+    q = [0.0] + [p / 100.0 for p in percentiles] + [1.0]
+
+    for index_name, values in indices.items():
+        values = np.asarray(values, dtype=np.float64).ravel()
+        finite = np.isfinite(values)
+        z, v = (zones, values) if finite.all() else (zones[finite], values[finite])
+        n = np.bincount(z, minlength=pixels.size)
+        total = np.bincount(z, weights=v, minlength=pixels.size)
+        sq = np.bincount(z, weights=v * v, minlength=pixels.size)
+
+        have = present[n[present] > 0]
+        counts = n[have]
+        mean = total[have] / counts
+        std = np.sqrt(np.maximum(sq[have] / counts - mean ** 2, 0.0))
+        dense = np.zeros(pixels.size, dtype=np.int64)
+        dense[have] = np.arange(len(have))
+        quant = grouped_quantiles(v, dense[z], counts, q)
+
+        rows = dict(zip(have.tolist(), range(len(have))))
+        for entry in table:
+            i = rows.get(entry["zone"])
+            if i is None:
+                entry["indices"][index_name] = {"count": 0}
+                continue
+            entry["indices"][index_name] = {
+                "count": int(counts[i]),
+                "mean": float(mean[i]),
+                "std": float(std[i]),
+                "min": float(quant[i, 0]),
+                "max": float(quant[i, -1]),
+                "percentiles": {f"p{p:g}": float(x) for p, x in zip(percentiles, quant[i, 1:-1])},
+            }
+    return table